@@ -0,0 +1,116 @@
+# bench_feed_decode.py
+# Ручной замер декодирования страницы ленты: json.loads (весь ответ в dict)
+# против decode_feed_items (msgspec, только нужные поля, без баннеров).
+# Считает CPU-время и пиковую память (tracemalloc) на страницу.
+# Записанные ответы API можно положить в BENCH_FEED_DIR (*.json), иначе
+# страницы генерируются по образцу ответа /feed/search.
+import json
+import os
+import random
+import time
+import tracemalloc
+from pathlib import Path
+
+from parser.feed_schema import decode_feed_items
+from parser.lalafo_parser import parse_lalafo_items
+
+FEED_DIR = os.getenv("BENCH_FEED_DIR")
+PAGES = int(os.getenv("BENCH_PAGES", "200"))
+PER_PAGE = int(os.getenv("BENCH_PER_PAGE", "20"))
+
+
+def make_item(i):
+    return {
+        "id": 100000000 + i,
+        "title": f"iPhone 13 Pro {random.choice(['128', '256', '512'])} GB",
+        "description": "Состояние идеальное, АКБ 89%. Коробка, зарядка. " * random.randint(1, 4),
+        "price": random.randrange(30000, 90000, 500),
+        "old_price": None,
+        "currency": "KGS",
+        "mobile": "+996555" + str(random.randint(100000, 999999)),
+        "city": random.choice(["Бишкек", "Ош"]),
+        "city_id": 103184,
+        "url": f"/bishkek/ads/iphone-13-pro-id-{100000000 + i}",
+        "created_time": 1760000000 + i,
+        "updated_time": 1760000000 + i,
+        "is_vip": False,
+        "is_premium": random.random() < 0.1,
+        "images": [
+            {
+                "id": i * 10 + k,
+                "original_url": f"https://img5.lalafo.com/i/posters/original/{i}_{k}.jpeg",
+                "thumbnail_url": f"https://img5.lalafo.com/i/posters/api/{i}_{k}.jpeg",
+                "width": 1200,
+                "height": 1600,
+                "is_main": k == 0,
+            }
+            for k in range(random.randint(3, 8))
+        ],
+        "params": [
+            {"id": 183, "name": "Модель", "value": "iPhone 13 Pro", "value_id": 32992},
+            {"id": 184, "name": "Память", "value": "256 ГБ", "value_id": 17},
+            {"id": 185, "name": "Состояние", "value": "Б/у", "value_id": 2},
+        ],
+        "user": {
+            "id": 5000000 + i,
+            "username": f"user{i}",
+            "is_pro": False,
+            "avatar": f"https://img5.lalafo.com/i/avatar/{i}.jpeg",
+            "registration_date": 1600000000,
+        },
+        "_links": {"self": {"href": f"/api/search/v3/feed/details/{100000000 + i}"}},
+    }
+
+
+def make_page(page):
+    items = [make_item(page * PER_PAGE + i) for i in range(PER_PAGE)]
+    # with_feed_banner=true: рекламные вставки без id
+    items.insert(5, {"type": "banner", "banner": {"image": "https://img5.lalafo.com/b.jpeg", "link": "/promo"}})
+    body = {"items": items, "_meta": {"totalCount": 5000, "pageCount": 250, "currentPage": page, "perPage": PER_PAGE}}
+    return json.dumps(body, ensure_ascii=False).encode()
+
+
+def load_pages():
+    if FEED_DIR:
+        return [path.read_bytes() for path in sorted(Path(FEED_DIR).glob("*.json"))]
+    random.seed(3)
+    return [make_page(page) for page in range(1, PAGES + 1)]
+
+
+def decode_json(body):
+    data = json.loads(body)
+    return data.get("items", [])
+
+
+def bench(decode, pages):
+    cpu = time.process_time()
+    for body in pages:
+        decode(body)
+    cpu = (time.process_time() - cpu) / len(pages)
+
+    peaks = []
+    for body in pages[:50]:
+        tracemalloc.start()
+        items = decode(body)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del items
+    return cpu, sum(peaks) / len(peaks)
+
+
+if __name__ == "__main__":
+    pages = load_pages()
+    size = sum(map(len, pages)) / len(pages)
+    print(f"Страниц: {len(pages)}, средний размер ответа: {size / 1024:.1f} КБ")
+
+    results = {}
+    for name, decode in (("json.loads", decode_json), ("msgspec", decode_feed_items)):
+        cpu, peak = bench(decode, pages)
+        results[name] = (cpu, peak)
+        print(f"{name:<11} CPU {cpu * 1e6:8.1f} мкс/страница, пик памяти {peak / 1024:7.1f} КБ/страница")
+
+    # Разбор поверх обоих вариантов должен давать одно и то же (без баннеров)
+    old = [ad for body in pages for ad in parse_lalafo_items(i for i in decode_json(body) if i.get("id") is not None)]
+    new = [ad for body in pages for ad in parse_lalafo_items(decode_feed_items(body))]
+    (old_cpu, old_peak), (new_cpu, new_peak) = results["json.loads"], results["msgspec"]
+    print(f"CPU x{old_cpu / new_cpu:.1f}, память x{old_peak / new_peak:.1f}; объявления совпадают: {old == new}")
@@ -0,0 +1,69 @@
+# bench_matching.py
+# Ручной замер: страница объявлений против всех фильтров модели —
+# наивный цикл по фильтрам (matches_filter) против FilterMatrix (NumPy).
+import random
+import time
+import os
+from types import SimpleNamespace
+
+from utils.matching import FilterMatrix, matches_filter
+
+FILTERS = int(os.getenv("BENCH_FILTERS", "20000"))
+ADS = int(os.getenv("BENCH_ADS", "60"))
+RUNS = int(os.getenv("BENCH_RUNS", "5"))
+
+COLORS = ["черный", "белый", "синий", "black", "gold", "silver", None]
+CITIES = ["Бишкек", "Ош", "Каракол", None]
+
+
+def make_filters(n):
+    return [
+        SimpleNamespace(
+            id=i,
+            max_price=random.choice([None, random.randrange(20000, 120000, 1000)]),
+            min_battery=random.choice([None, None, 80, 85, 90]),
+            min_storage_gb=random.choice([None, None, 128, 256]),
+            color=random.choice([None, None, None, "черный", "white", "gold"]),
+            city=random.choice([None, None, "Бишкек", "Ош"]),
+        )
+        for i in range(n)
+    ]
+
+
+def make_ads(n):
+    return [
+        {
+            "lalafo_id": i,
+            "new_price": random.choice([None, random.randrange(15000, 130000, 500)]),
+            "battery": random.choice([None, f"{random.randint(70, 100)} %"]),
+            "storage": random.choice([None, "64 GB", "128 GB", "256 ГБ", "512GB"]),
+            "color": random.choice(COLORS),
+            "city": random.choice(CITIES),
+        }
+        for i in range(n)
+    ]
+
+
+def bench(fn):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        result = fn()
+    return (time.perf_counter() - start) / RUNS, result
+
+
+if __name__ == "__main__":
+    random.seed(42)
+    filters = make_filters(FILTERS)
+    ads = make_ads(ADS)
+
+    naive_time, naive = bench(lambda: [[flt for flt in filters if matches_filter(flt, ad)] for ad in ads])
+    build_time, matrix = bench(lambda: FilterMatrix(filters))
+    matrix_time, vectorized = bench(lambda: matrix.matched_filters(ads))
+
+    same = [[f.id for f in row] for row in naive] == [[f.id for f in row] for row in vectorized]
+    hits = sum(len(row) for row in naive)
+    print(f"Фильтров: {FILTERS}, объявлений на странице: {ADS}, попаданий: {hits}")
+    print(f"Наивный цикл:         {naive_time * 1000:.1f} мс/страница")
+    print(f"FilterMatrix (сборка): {build_time * 1000:.1f} мс")
+    print(f"FilterMatrix (поиск):  {matrix_time * 1000:.1f} мс/страница")
+    print(f"Ускорение поиска: x{naive_time / matrix_time:.1f}, результаты совпадают: {same}")
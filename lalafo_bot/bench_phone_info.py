@@ -0,0 +1,65 @@
+# bench_phone_info.py
+# Микробенчмарк разбора характеристик: extract_phone_info против extract_phone_info_fast
+# на корпусе реалистичных заголовков/описаний. Проверяет, что результаты совпадают.
+import os
+import random
+import time
+
+from parser import get_phone_characters as gpc
+from parser.get_phone_characters import COLORS, extract_phone_info, extract_phone_info_fast
+
+ITEMS = int(os.getenv("BENCH_ITEMS", "5000"))
+# Доля повторов: одно и то же объявление приходит в ленте из прогона в прогон
+REPEAT_SHARE = float(os.getenv("BENCH_REPEAT_SHARE", "0.5"))
+
+MODELS = ["iPhone 11", "iPhone 12 Pro", "iPhone 13", "iPhone 13 Pro Max", "iPhone 14 Pro", "iPhone 15", "iPhone 16 Pro Max"]
+STORAGE = ["64 GB", "128 GB", "256GB", "512 ГБ", "1 TB", "128гб", ""]
+PHRASES = [
+    "Состояние идеальное, без царапин.",
+    "Продаю в связи с покупкой нового телефона.",
+    "Face ID работает, True Tone на месте.",
+    "В комплекте коробка, зарядка и чехол.",
+    "Никогда не ремонтировался, не вскрывался.",
+    "Обмен не интересует, торг у телефона.",
+    "Батарея держит весь день, АКБ {battery}%.",
+    "Есть небольшая трещина на заднем стекле.",
+    "Звоните или пишите в WhatsApp, отвечу быстро.",
+    "Доставка по городу бесплатно.",
+]
+
+
+def make_item():
+    model = random.choice(MODELS)
+    color = random.choice(COLORS + [""] * 5)
+    storage = random.choice(STORAGE)
+    battery = random.randint(75, 100)
+    title = ", ".join(p for p in [model, storage, color.capitalize()] if p)
+    phrases = random.sample(PHRASES, k=random.randint(2, 7))
+    description = " ".join(p.format(battery=battery) for p in phrases) * random.randint(1, 3)
+    return title, description
+
+
+def bench(fn, corpus):
+    start = time.perf_counter()
+    result = [fn(title, description) for title, description in corpus]
+    return (time.perf_counter() - start) / len(corpus), result
+
+
+if __name__ == "__main__":
+    random.seed(7)
+    unique = [make_item() for _ in range(int(ITEMS * (1 - REPEAT_SHARE)) or 1)]
+    corpus = unique + [random.choice(unique) for _ in range(ITEMS - len(unique))]
+    random.shuffle(corpus)
+
+    old_time, old = bench(extract_phone_info, corpus)
+    gpc._phone_info_cache.clear()
+    cold_time, _ = bench(gpc._extract_phone_info_uncached, corpus)
+    fast_time, fast = bench(extract_phone_info_fast, corpus)
+
+    keys = ("model", "storage", "battery", "color")
+    same = all({k: a[k] for k in keys} == {k: b[k] for k in keys} for a, b in zip(old, fast))
+    print(f"Объявлений: {len(corpus)} (уникальных: {len(unique)})")
+    print(f"extract_phone_info:          {old_time * 1e6:.1f} мкс/объявление")
+    print(f"быстрый разбор без кэша:     {cold_time * 1e6:.1f} мкс/объявление")
+    print(f"extract_phone_info_fast:     {fast_time * 1e6:.1f} мкс/объявление (с кэшем)")
+    print(f"Ускорение: x{old_time / cold_time:.1f} без кэша, x{old_time / fast_time:.1f} с кэшем; совпадают: {same}")
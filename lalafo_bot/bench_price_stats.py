@@ -0,0 +1,72 @@
+# bench_price_stats.py
+# Ручной замер скетча цен (utils/price_stats.py): точность медианы и квантилей
+# против точного расчёта, стоимость учёта объявления и размер в price_stats.
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from parser.records import ParsedAd
+from utils.price_stats import ALL_STORAGE, ModelPriceStats, PriceSketch
+
+ADS = int(os.getenv("BENCH_ADS", "200000"))
+STORAGES = [64, 128, 256, 512]
+
+
+def make_ads(n):
+    ads = []
+    for i in range(n):
+        storage_gb = random.choice(STORAGES + [None])
+        base = 40000 + 12000 * STORAGES.index(storage_gb) if storage_gb else 50000
+        price = int(random.lognormvariate(np.log(base), 0.25))
+        ads.append(ParsedAd(lalafo_id=i, new_price=price, storage_gb=storage_gb))
+    return ads
+
+
+if __name__ == "__main__":
+    random.seed(5)
+    ads = make_ads(ADS)
+    stats = ModelPriceStats(1)
+    now = datetime(2026, 10, 1)
+
+    # Как в прогоне: observe копит кандидатов, save_price_stats добавляет новые в скетч
+    start = time.perf_counter()
+    for i in range(0, ADS, 20):
+        stats.observe(ads[i:i + 20])
+        stats.add(
+            [stats.pending.pop(str(ad.lalafo_id)) for ad in ads[i:i + 20]],
+            now=now + timedelta(seconds=i),
+        )
+    observe_time = (time.perf_counter() - start) / ADS
+
+    print(f"Объявлений: {ADS}, учёт: {observe_time * 1e6:.2f} мкс/объявление")
+    # Затухание по времени в замере почти не сказывается (прогон укладывается в пару суток)
+    for key in [ALL_STORAGE] + STORAGES:
+        prices = np.array([ad.new_price for ad in ads if key == ALL_STORAGE or ad.storage_gb == key])
+        sketch = stats.sketches[key]
+        errors = [
+            abs(sketch.quantile(q) - np.quantile(prices, q)) / np.quantile(prices, q)
+            for q in (0.1, 0.25, 0.5, 0.75, 0.9)
+        ]
+        print(
+            f"память {key or 'все':>4}: медиана {sketch.median():9.0f} (точно {np.median(prices):9.0f}), "
+            f"макс. ошибка квантилей {max(errors) * 100:.2f}%, корзин {len(sketch.counts)}, "
+            f"{len(sketch.to_bytes())} Б"
+        )
+
+    restored = PriceSketch.from_bytes(stats.sketches[ALL_STORAGE].to_bytes())
+    print(f"После сериализации медиана та же: {abs(restored.median() - stats.sketches[ALL_STORAGE].median()) < 1e-6}")
+
+    ad = ads[0]
+    start = time.perf_counter()
+    for _ in range(100000):
+        stats._medians.clear()
+        stats.ad_median(ad)
+    cold = (time.perf_counter() - start) / 100000
+    start = time.perf_counter()
+    for _ in range(100000):
+        stats.ad_median(ad)
+    warm = (time.perf_counter() - start) / 100000
+    print(f"Медиана для объявления: {cold * 1e6:.1f} мкс без кэша, {warm * 1e6:.2f} мкс из кэша")
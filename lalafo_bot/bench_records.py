@@ -0,0 +1,69 @@
+# bench_records.py
+# Ручной замер: память и доступ к полям для распарсенных объявлений —
+# dict (как раньше возвращал parse_lalafo_items) против ParsedAd и ParsedAdBatch.
+import os
+import pickle
+import random
+import time
+import tracemalloc
+
+from parser.records import FIELDS, ParsedAd, ParsedAdBatch
+
+ADS = int(os.getenv("BENCH_ADS", "100000"))
+
+
+def make_values(i):
+    return {
+        "lalafo_id": 100000000 + i,
+        "title": "iPhone 13 Pro 256 GB",
+        "model": "iphone 13 pro",
+        "new_price": random.randrange(30000, 90000, 500),
+        "author_number": "+996555123456",
+        "description": "Состояние идеальное, АКБ 89%.",
+        "city": "Бишкек",
+        "storage": "256 GB",
+        "battery": "89 %",
+        "storage_gb": 256,
+        "battery_pct": 89,
+        "color": "черный",
+        "url": f"https://lalafo.kg/bishkek/ads/iphone-13-pro-id-{100000000 + i}",
+    }
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    ads = build()
+    built = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return ads, built, size
+
+
+if __name__ == "__main__":
+    random.seed(1)
+    # Строки общие для всех вариантов — меряем только сами контейнеры
+    values = [make_values(i) for i in range(ADS)]
+
+    dicts, dict_time, dict_size = measure(lambda: [dict(v) for v in values])
+    records, rec_time, rec_size = measure(lambda: [ParsedAd(**v) for v in values])
+    batch, batch_time, batch_size = measure(lambda: ParsedAdBatch.from_ads(records))
+
+    start = time.perf_counter()
+    total = sum(ad["new_price"] for ad in dicts if ad["new_price"] <= 60000)
+    dict_access = time.perf_counter() - start
+    start = time.perf_counter()
+    total_rec = sum(ad.new_price for ad in records if ad.new_price <= 60000)
+    rec_access = time.perf_counter() - start
+
+    print(f"Объявлений: {ADS}, полей: {len(FIELDS)}")
+    print(f"dict:          {dict_size / ADS:6.0f} Б/объявление, сборка {dict_time * 1e6 / ADS:.2f} мкс")
+    print(f"ParsedAd:      {rec_size / ADS:6.0f} Б/объявление, сборка {rec_time * 1e6 / ADS:.2f} мкс")
+    print(f"ParsedAdBatch: {batch_size / ADS:6.0f} Б/объявление (поверх ParsedAd)")
+    print(f"Проход по цене: dict {dict_access * 1e3:.1f} мс, ParsedAd {rec_access * 1e3:.1f} мс; совпадает: {total == total_rec}")
+    chunk = 100
+    print(
+        f"pickle чанка из {chunk}: список ParsedAd {len(pickle.dumps(records[:chunk]))} Б, "
+        f"ParsedAdBatch {len(pickle.dumps(ParsedAdBatch.from_ads(records[:chunk])))} Б, "
+        f"dict {len(pickle.dumps(dicts[:chunk]))} Б"
+    )
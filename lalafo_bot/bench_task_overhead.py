@@ -0,0 +1,71 @@
+# bench_task_overhead.py
+# Ручной замер накладных расходов Celery-таски (без Celery и без обхода Lalafo):
+# «до» — новый loop + engine + Bot на каждый вызов, «после» — постоянные ресурсы воркера.
+import time
+import asyncio
+import os
+from dotenv import load_dotenv
+
+# Подгрузим .env (нужны DATABASE_URL и BOT_TOKEN)
+load_dotenv()
+
+from aiogram import Bot
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from utils.worker_runtime import get_runtime, shutdown_runtime
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+RUNS = int(os.getenv("BENCH_RUNS", "50"))
+
+
+async def _task_body(SessionLocal, bot):
+    # Минимальная «таска»: один запрос к БД и обращение к сессии бота
+    async with SessionLocal() as session:
+        await session.execute(text("SELECT 1"))
+    await bot.session.create_session()
+
+
+async def _old_style_task():
+    engine = create_async_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
+    SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    bot = Bot(token=BOT_TOKEN)
+    try:
+        await _task_body(SessionLocal, bot)
+        await engine.dispose()
+    finally:
+        await bot.session.close()
+
+
+def bench_old():
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(_old_style_task())
+        finally:
+            loop.close()
+    return (time.perf_counter() - start) / RUNS
+
+
+def bench_new():
+    runtime = get_runtime()
+    runtime.run(_task_body(runtime.SessionLocal, runtime.bot))  # прогрев: первое соединение
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        runtime.run(_task_body(runtime.SessionLocal, runtime.bot))
+    elapsed = (time.perf_counter() - start) / RUNS
+    shutdown_runtime()
+    return elapsed
+
+
+if __name__ == "__main__":
+    old = bench_old()
+    new = bench_new()
+    print(f"Прогонов: {RUNS}")
+    print(f"До  (ресурсы на каждую таску): {old * 1000:.2f} мс/таска")
+    print(f"После (ресурсы воркера):       {new * 1000:.2f} мс/таска")
+    print(f"Ускорение: x{old / new:.1f}")
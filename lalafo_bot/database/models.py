@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Numeric, UniqueConstraint
+from sqlalchemy import Column, Integer, BigInteger, String, ForeignKey, DateTime, Numeric, Float, UniqueConstraint, Index, PrimaryKeyConstraint, LargeBinary
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .session import Base
@@ -11,8 +11,19 @@ class Filter(Base):
     user_id = Column(Integer, index=True, nullable=False)
     model = Column(String, nullable=False)
     max_price = Column(Integer, nullable=True)
+    # Дополнительные критерии (None — без ограничения)
+    min_battery = Column(Integer, nullable=True)
+    min_storage_gb = Column(Integer, nullable=True)
+    color = Column(String, nullable=True)
+    city = Column(String, nullable=True)
+    # «Выгодные» объявления: цена хотя бы на столько % ниже медианы модели (см. utils/price_stats.py)
+    below_median_pct = Column(Integer, nullable=True)
     last_page = Column(Integer, default=1)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Адаптивный опрос: когда проверять фильтр снова и сколько совпадений в час он даёт
+    next_check_at = Column(DateTime, nullable=True, index=True)
+    last_checked_at = Column(DateTime, nullable=True)
+    hit_rate = Column(Float, nullable=False, default=0.0, server_default="0")
 
     ads = relationship("FilterAd", back_populates="filter", cascade="all, delete-orphan")
 
@@ -26,11 +37,43 @@ class Ad(Base):
     city = Column(String)
     url = Column(String)
     last_price = Column(Integer)
+    # Характеристики, распознанные парсером (None — не удалось распознать)
+    model = Column(String, nullable=True)
+    storage_gb = Column(Integer, nullable=True)
+    battery_pct = Column(Integer, nullable=True)
+    color = Column(String, nullable=True)
+    seller_phone = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     filters = relationship("FilterAd", back_populates="ad", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_ads_model_last_price", "model", "last_price"),
+        Index("ix_ads_model_storage_gb", "model", "storage_gb"),
+    )
+
+
+class AdPrice(Base):
+    """
+    История цен объявления: строка пишется только когда цена в ads меняется.
+    Только дописывается (старые строки прореживает compact_price_history),
+    без суррогатного id — первичный ключ (ad_id, observed_at) и есть индекс
+    для выборок по объявлению за период.
+    """
+    __tablename__ = "ad_prices"
+
+    ad_id = Column(Integer, ForeignKey("ads.id", ondelete="CASCADE"), nullable=False)
+    observed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    price = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("ad_id", "observed_at", name="pk_ad_prices"),
+        # Строки идут в порядке времени — BRIN на observed_at занимает килобайты
+        # и отсекает блоки при выборках за период по всей таблице
+        Index("ix_ad_prices_observed_at", "observed_at", postgresql_using="brin"),
+    )
+
 
 class FilterAd(Base):
     __tablename__ = "filter_ads"
@@ -46,3 +89,47 @@ class FilterAd(Base):
 
     __table_args__ = (UniqueConstraint("filter_id", "ad_id", name="uq_filter_ad"),)
 
+
+
+class CrawlWatermark(Base):
+    __tablename__ = "crawl_watermarks"
+
+    model_param = Column(Integer, primary_key=True)
+    newest_lalafo_id = Column(BigInteger, nullable=True)
+    last_deep_sweep_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PriceStat(Base):
+    """
+    Скетч цен модели (utils/price_stats.py): по всей модели (storage_gb = 0)
+    и по объёму памяти. median — для чтения глазами и аналитики, источник истины — sketch.
+    """
+    __tablename__ = "price_stats"
+
+    model_param = Column(Integer, primary_key=True)
+    storage_gb = Column(Integer, primary_key=True, default=0)
+    count = Column(Float, nullable=False, default=0.0)
+    median = Column(Integer, nullable=True)
+    sketch = Column(LargeBinary, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class PriceObservation(Base):
+    """
+    Последняя учтённая в price_stats цена объявления модели. Объявление
+    попадает в скетч, только если его здесь нет или цена другая —
+    одна проверка на все процессы и перезапуски воркеров
+    (см. services_for_prices.save_price_stats).
+    """
+    __tablename__ = "price_observations"
+
+    model_param = Column(Integer, primary_key=True)
+    lalafo_id = Column(String, primary_key=True)
+    price = Column(Integer, nullable=False)
+    observed_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        # Для срока хранения в compact_price_history
+        Index("ix_price_observations_observed_at", "observed_at"),
+    )
@@ -1,4 +1,5 @@
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
@@ -19,3 +20,30 @@ AsyncSessionLocal = sessionmaker(
 
 Base = declarative_base()
 
+
+
+async def commit_or_flush(session: AsyncSession, commit: bool = True) -> None:
+    """
+    commit=True — обычный режим хелперов (commit на каждый вызов).
+    commit=False — хелпер внутри unit_of_work: только flush, коммитит вызывающий.
+    """
+    if commit:
+        await session.commit()
+    else:
+        await session.flush()
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession):
+    """
+    Одна транзакция на весь прогон фильтра/группы:
+    commit один раз в конце, rollback целиком при ошибке.
+    Внутри хелперы вызываются с commit=False, а отдельные шаги можно
+    изолировать через session.begin_nested() (SAVEPOINT).
+    """
+    try:
+        yield session
+        await session.commit()
+    except BaseException:
+        await session.rollback()
+        raise
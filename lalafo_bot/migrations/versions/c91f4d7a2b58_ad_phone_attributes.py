@@ -0,0 +1,123 @@
+"""ad phone attributes
+
+Revision ID: c91f4d7a2b58
+Revises: a5d83f0c6e27
+Create Date: 2026-10-17 19:02:37.184950
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import re
+
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c91f4d7a2b58'
+down_revision: Union[str, Sequence[str], None] = 'a5d83f0c6e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько объявлений разбираем и обновляем за один проход backfill
+BACKFILL_BATCH = 1000
+
+# Замороженная копия разбора из parser/get_phone_characters.py на момент этой
+# ревизии: повторный прогон миграции даёт те же данные, как бы ни менялся парсер
+_COLORS = [
+    "черный", "белый", "синий", "красный", "зеленый", "желтый", "розовый", "фиолетовый", "серый",
+    "black", "white", "blue", "red", "green", "yellow", "pink", "purple", "gray", "silver", "gold"
+]
+_STORAGE_PATTERN = re.compile(r"(\d+\s*(ГБ|GB))", re.IGNORECASE)
+_BATTERY_PATTERN = re.compile(r"(\d{1,3}\s*%)")
+_DIGITS_PATTERN = re.compile(r"\d+")
+
+
+def _parse_title(title: str) -> dict:
+    """Модель, память (ГБ), батарея (%) и цвет из заголовка «Модель, 128 GB, 90 %, черный»"""
+    parts = [p.strip() for p in title.split(",")]
+    text = " ".join(parts[1:] + [""])
+    storage = _STORAGE_PATTERN.search(text)
+    battery = _BATTERY_PATTERN.search(text)
+    lowered = text.lower()
+    return {
+        'model': parts[0] if title else "",
+        'storage_gb': int(_DIGITS_PATTERN.match(storage.group(1)).group()) if storage else None,
+        'battery_pct': int(_DIGITS_PATTERN.match(battery.group(1)).group()) if battery else None,
+        'color': next((c for c in _COLORS if c in lowered), None),
+    }
+
+
+def _backfill_ads() -> None:
+    """
+    Заполнить характеристики уже сохранённых объявлений по заголовку.
+    Описание и телефон продавца раньше не сохранялись — для старых
+    объявлений battery_pct распознаётся только из заголовка, seller_phone остаётся NULL.
+    """
+    bind = op.get_bind()
+    ads = sa.table(
+        'ads',
+        sa.column('id', sa.Integer),
+        sa.column('title', sa.String),
+        sa.column('model', sa.String),
+        sa.column('storage_gb', sa.Integer),
+        sa.column('battery_pct', sa.Integer),
+        sa.column('color', sa.String),
+    )
+    update = ads.update().where(ads.c.id == sa.bindparam('ad_id')).values(
+        model=sa.bindparam('b_model'),
+        storage_gb=sa.bindparam('b_storage_gb'),
+        battery_pct=sa.bindparam('b_battery_pct'),
+        color=sa.bindparam('b_color'),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(ads.c.id, ads.c.title)
+            .where(ads.c.id > last_id)
+            .order_by(ads.c.id)
+            .limit(BACKFILL_BATCH)
+        ).all()
+        if not rows:
+            break
+        params = []
+        for ad_id, title in rows:
+            info = _parse_title(title or "")
+            params.append({
+                'ad_id': ad_id,
+                'b_model': info['model'] or None,
+                'b_storage_gb': info['storage_gb'],
+                'b_battery_pct': info['battery_pct'],
+                'b_color': info['color'],
+            })
+        bind.execute(update, params)
+        last_id = rows[-1].id
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.add_column('ads', sa.Column('model', sa.String(), nullable=True))
+    op.add_column('ads', sa.Column('storage_gb', sa.Integer(), nullable=True))
+    op.add_column('ads', sa.Column('battery_pct', sa.Integer(), nullable=True))
+    op.add_column('ads', sa.Column('color', sa.String(), nullable=True))
+    op.add_column('ads', sa.Column('seller_phone', sa.String(), nullable=True))
+    # ### end Alembic commands ###
+    # Индексы строим после backfill: один проход по готовым данным дешевле,
+    # чем поддерживать их на каждом UPDATE
+    _backfill_ads()
+    op.create_index('ix_ads_model_last_price', 'ads', ['model', 'last_price'], unique=False)
+    op.create_index('ix_ads_model_storage_gb', 'ads', ['model', 'storage_gb'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.drop_index('ix_ads_model_storage_gb', table_name='ads')
+    op.drop_index('ix_ads_model_last_price', table_name='ads')
+    op.drop_column('ads', 'seller_phone')
+    op.drop_column('ads', 'color')
+    op.drop_column('ads', 'battery_pct')
+    op.drop_column('ads', 'storage_gb')
+    op.drop_column('ads', 'model')
+    # ### end Alembic commands ###
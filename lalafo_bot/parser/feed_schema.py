@@ -0,0 +1,93 @@
+import logging
+from typing import Any, List, Optional, Union
+
+import msgspec
+
+logger = logging.getLogger(__name__)
+
+
+class FeedItem(msgspec.Struct):
+    """
+    Объявление из ленты Lalafo — только поля, которые мы используем.
+    Остальные ключи (фото, параметры, продавец, _links ...) декодер
+    пропускает, не создавая для них Python-объектов.
+
+    Текстовые поля объявлены как Any и приводятся к строке в __post_init__:
+    Lalafo иногда отдаёт телефон или город числом (а то и объектом), и
+    строгий Optional[str] выбрасывал бы из-за этого всё объявление.
+    Значение, которое строкой не станет (объект, список), заменяется на None.
+
+    get() повторяет dict.get, чтобы parse_lalafo_items и _item_id
+    работали и с FeedItem, и с обычным dict из json.loads.
+    """
+
+    id: Optional[int] = None
+    title: Any = ""
+    description: Any = ""
+    price: Optional[Union[int, float]] = None
+    mobile: Any = None
+    city: Any = None
+    url: Any = None
+
+    def __post_init__(self):
+        for name in _TEXT_FIELDS:
+            value = getattr(self, name)
+            if value is not None and not isinstance(value, str):
+                setattr(self, name, _as_text(value))
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+
+_TEXT_FIELDS = ("title", "description", "mobile", "city", "url")
+
+
+def _as_text(value: Any) -> Optional[str]:
+    """Число → строка (996700123456 → "996700123456"), остальное нестроковое → None"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return str(value)
+
+
+class _FeedPage(msgspec.Struct):
+    # Raw — только границы элемента в буфере: баннеры и битые элементы
+    # не валят всю страницу, а отбрасываются поштучно
+    items: List[msgspec.Raw] = []
+
+
+# strict=False: "123" → 123 для id/цены, как это было бы после int() у dict
+_page_decoder = msgspec.json.Decoder(_FeedPage)
+_item_decoder = msgspec.json.Decoder(FeedItem, strict=False)
+
+
+def decode_feed_items(body: bytes) -> List[FeedItem]:
+    """
+    Сырой ответ /feed/search → объявления (FeedItem) без баннеров.
+
+    Баннеры ленты и прочие элементы без id отбрасываются сразу: дальше
+    по конвейеру (разбор, upsert, матчинг) они всё равно не нужны.
+    Ошибка формата всего ответа — msgspec.DecodeError (как json.JSONDecodeError).
+    """
+    items: List[FeedItem] = []
+    skipped = 0
+    error = None
+    for raw in _page_decoder.decode(body).items:
+        try:
+            item = _item_decoder.decode(raw)
+        except msgspec.ValidationError as e:
+            skipped += 1
+            error = e
+            continue
+        if item.id is None:
+            continue
+        items.append(item)
+    if skipped:
+        # Каждый пропуск — потерянное объявление: это видно в логах, а не только в debug
+        logger.warning(f"Пропущено {skipped} элементов ленты с неожиданным форматом (последняя ошибка: {error})")
+    return items
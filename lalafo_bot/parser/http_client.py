@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+# Настройки пула соединений к lalafo.kg (можно переопределить через окружение)
+HTTP_LIMIT = int(os.getenv("LALAFO_HTTP_LIMIT", "20"))
+HTTP_LIMIT_PER_HOST = int(os.getenv("LALAFO_HTTP_LIMIT_PER_HOST", "10"))
+HTTP_KEEPALIVE = float(os.getenv("LALAFO_HTTP_KEEPALIVE", "60"))
+HTTP_DNS_TTL = int(os.getenv("LALAFO_HTTP_DNS_TTL", "300"))
+HTTP_TIMEOUT = float(os.getenv("LALAFO_HTTP_TIMEOUT", "20"))
+
+
+class LalafoClient:
+    """
+    Долгоживущий HTTP-клиент парсера: одна ClientSession с пулом
+    keep-alive соединений на процесс/воркер вместо новой сессии на каждый вызов.
+
+    Считает открытые и переиспользованные соединения, чтобы видеть
+    экономию на TCP+TLS рукопожатиях под нагрузкой.
+    """
+
+    def __init__(
+        self,
+        *,
+        limit: int = HTTP_LIMIT,
+        limit_per_host: int = HTTP_LIMIT_PER_HOST,
+        keepalive_timeout: float = HTTP_KEEPALIVE,
+        ttl_dns_cache: int = HTTP_DNS_TTL,
+        timeout: float = HTTP_TIMEOUT,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = timeout
+
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.requests = 0
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            self.requests += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            self.connections_opened += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.connections_reused += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """ClientSession создаётся лениво внутри работающего event loop"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.ttl_dns_cache,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[self._trace_config()],
+            )
+            self._loop = asyncio.get_running_loop()
+        return self._session
+
+    def is_bound_to_current_loop(self) -> bool:
+        try:
+            return self._loop is asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+
+    def _drop_stale_session(self) -> None:
+        """
+        Убрать сессию, созданную в другом event loop, не оставляя её открытой.
+        Если её loop ещё жив — сессия закрывается в нём; закрыть её из чужого
+        loop нельзя, поэтому иначе коннектор только отсоединяется (без
+        предупреждения «Unclosed client session»), и это пишется в лог.
+        """
+        session, loop = self._session, self._loop
+        self._session = None
+        self._loop = None
+        if session is None or session.closed:
+            return
+        if loop is not None and not loop.is_closed():
+            if loop.is_running():
+                # loop работает в другом потоке — закрываем сессию там
+                asyncio.run_coroutine_threadsafe(session.close(), loop)
+                logger.info("HTTP-сессия Lalafo из другого event loop закрыта в своём loop")
+                return
+            if not _has_running_loop():
+                loop.run_until_complete(session.close())
+                logger.info("HTTP-сессия Lalafo из другого event loop закрыта в своём loop")
+                return
+        session.detach()
+        logger.warning(
+            "HTTP-сессия Lalafo из закрытого/чужого event loop отброшена без закрытия "
+            "(коннектор отсоединён)"
+        )
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info(f"HTTP-клиент Lalafo закрыт: {self.stats()}")
+        self._session = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections_reused": self.connections_reused,
+        }
+
+
+_client: Optional[LalafoClient] = None
+
+
+def _has_running_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def get_client() -> LalafoClient:
+    """
+    Общий клиент процесса. Если предыдущая сессия была создана в другом
+    event loop — она закрывается (или отсоединяется, если её loop уже закрыт)
+    и при следующем обращении создаётся заново.
+    """
+    global _client
+    if _client is None:
+        _client = LalafoClient()
+    elif _client._session is not None and not _client.is_bound_to_current_loop():
+        _client._drop_stale_session()
+    return _client
+
+
+async def close_client() -> None:
+    """Закрыть общий клиент (вызывать при остановке воркера/процесса)"""
+    if _client is not None:
+        await _client.close()
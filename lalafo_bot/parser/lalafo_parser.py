@@ -1,8 +1,18 @@
 import asyncio
+import json
+import os
+import random
 import aiohttp
 import logging
-from typing import List, Dict, Tuple, Optional
-from .get_phone_characters import extract_phone_info
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Dict, Tuple, Optional
+from .feed_schema import FeedItem, decode_feed_items
+from .get_phone_characters import extract_phone_info_fast
+from .records import ParsedAd, ParsedAdBatch
+from .http_client import get_client
+from .rate_limit import get_rate_limiter
+from .response_cache import get_response_cache, make_cache_key
 
 logger = logging.getLogger(__name__)
 
@@ -12,28 +22,130 @@ HEADERS = {
     "Accept": "application/json",
     "device": "pc"
 }
+# Сколько страниц одной модели запрашивать параллельно по умолчанию
+PAGE_CONCURRENCY = 3
 
+# Повторы при 429/5xx: коды, число попыток и границы экспоненциальной задержки (сек)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Из них троттлинг — только эти: лимитер снижает скорость лишь на них,
+# обычные 5xx просто повторяются с задержкой
+THROTTLE_STATUSES = {429, 503}
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
 
-async def fetch_json(session: aiohttp.ClientSession, params: dict) -> Optional[Dict]:
-    """ Запрос к API Lalafo """
+# Разбор больших пачек вне event loop: process | thread | off.
+# В дочерних процессах Celery prefork (они демонические) своих процессов
+# не завести — там process сам заменяется на thread
+PARSE_POOL = os.getenv("LALAFO_PARSE_POOL", "off")
+PARSE_POOL_WORKERS = int(os.getenv("LALAFO_PARSE_WORKERS", "2"))
+# Меньшие пачки разбираются на месте — передача в пул дороже самого разбора
+PARSE_OFFLOAD_MIN_ITEMS = int(os.getenv("LALAFO_PARSE_OFFLOAD_MIN_ITEMS", "200"))
+# Объявлений на одну задачу пула: амортизирует pickle/IPC
+PARSE_CHUNK_SIZE = int(os.getenv("LALAFO_PARSE_CHUNK_SIZE", "100"))
+
+
+class LalafoUnavailableError(Exception):
+    """
+    API недоступно (429/5xx/сеть) и повторы исчерпаны.
+    В отличие от пустой ленты (fetch_json → None) курсор страниц сбрасывать нельзя.
+    """
+
+    def __init__(self, status: Optional[int], message: str):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def throttled(self) -> bool:
+        return self.status in THROTTLE_STATUSES
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах (форму с HTTP-датой Lalafo не присылает — игнорируем)"""
+    if not value:
+        return None
     try:
-        async with session.get(BASE_URL, params=params, headers=HEADERS) as resp:
-            if resp.status != 200:
-                logger.warning(f"API вернул {resp.status} для {resp.url}, считаем что объявлений нет")
-                return None
-            return await resp.json()
-    except Exception as e:
-        logger.error(f"Ошибка при запросе {BASE_URL} с params={params}: {e}")
+        return max(0.0, float(value))
+    except ValueError:
         return None
 
 
-async def get_items_by_model(session: aiohttp.ClientSession,
+def _backoff_delay(attempt: int, retry_after: Optional[float]) -> float:
+    """Экспоненциальная задержка с full jitter, но не меньше Retry-After"""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+async def fetch_json(session: Optional[aiohttp.ClientSession],
+                     params: dict,
+                     decode: Callable[[bytes], Any] = json.loads) -> Optional[Any]:
+    """
+    Запрос к API Lalafo (session=None → общий пул соединений процесса).
+    Тело ответа декодируется из байтов функцией decode (по умолчанию json.loads).
+
+    Все запросы проходят через общий адаптивный лимитер; снижает скорость
+    только троттлинг (429/503). На 429/5xx и сетевые
+    ошибки — повтор с экспоненциальной задержкой (с учётом Retry-After);
+    если повторы исчерпаны — LalafoUnavailableError. Прочие не-200 → None.
+
+    Успешные ответы кладутся в TTL-кэш (см. response_cache), попадание
+    в кэш не тратит ни запрос, ни токен лимитера.
+    """
+    cache = get_response_cache()
+    cache_key = make_cache_key(params)
+    if cache is not None:
+        body = await cache.get(cache_key)
+        if body is not None:
+            return decode(body)
+
+    if session is None:
+        session = get_client().session
+    limiter = get_rate_limiter()
+
+    status: Optional[int] = None
+    for attempt in range(MAX_RETRIES + 1):
+        retry_after = None
+        await limiter.acquire()
+        try:
+            async with session.get(BASE_URL, params=params, headers=HEADERS) as resp:
+                status = resp.status
+                if status == 200:
+                    limiter.on_success()
+                    body = await resp.read()
+                    data = decode(body)
+                    if cache is not None:
+                        await cache.set(cache_key, body)
+                    return data
+                if status not in RETRY_STATUSES:
+                    logger.warning(f"API вернул {status} для {resp.url}, считаем что объявлений нет")
+                    return None
+                retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+                if status in THROTTLE_STATUSES:
+                    limiter.on_throttle(retry_after)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            status = None
+            logger.warning(f"Сетевая ошибка при запросе {BASE_URL} с params={params}: {e!r}")
+        except Exception as e:
+            logger.error(f"Ошибка при запросе {BASE_URL} с params={params}: {e}")
+            return None
+
+        if attempt < MAX_RETRIES:
+            delay = _backoff_delay(attempt, retry_after)
+            logger.info(f"Повтор {attempt + 1}/{MAX_RETRIES} через {delay:.1f}с (status={status})")
+            await asyncio.sleep(delay)
+
+    raise LalafoUnavailableError(status, f"Lalafo недоступно (status={status}), params={params}")
+
+
+async def get_items_by_model(session: Optional[aiohttp.ClientSession],
                              model_id: int,
                              page: int = 1,
                              max_price: Optional[int] = None,
-                             per_page: int = 20) -> List[Dict]:
+                             per_page: int = 20) -> List[FeedItem]:
     """
     Загружаем одну страницу объявлений по конкретной модели.
+    session=None → общий пул соединений процесса (см. http_client).
+    Ответ декодируется сразу в FeedItem (см. feed_schema), без баннеров.
     """
     params = {
         "category_id": 1361,
@@ -46,72 +158,278 @@ async def get_items_by_model(session: aiohttp.ClientSession,
     if max_price is not None:
         params["price[to]"] = max_price
 
-    data = await fetch_json(session, params)
-    if not data or "items" not in data:
-        return []
-    return data.get("items", [])
+    items = await fetch_json(session, params, decode=decode_feed_items)
+    return items or []
+
+
+class PageStream:
+    """
+    Страницы ленты модели по одной, по мере готовности (async for).
+
+    Держит впереди до `concurrency` запросов (скользящее окно), но отдаёт
+    страницы строго по порядку и не забегает дальше окна, пока потребитель
+    не заберёт текущую — это и есть backpressure для конвейера обработки.
+    Остановка и курсор те же, что у get_all_items: после обхода в next_page
+    следующая страница (1 — лента кончилась, номер недоступной страницы —
+    если Lalafo перестало отвечать; на первой странице ошибка пробрасывается).
+    """
+
+    def __init__(self,
+                 model_id: int,
+                 max_price: Optional[int] = None,
+                 start_page: int = 1,
+                 pages: int = 3,
+                 concurrency: Optional[int] = None):
+        self.model_id = model_id
+        self.max_price = max_price
+        self.start_page = start_page
+        self.pages = pages
+        self.window = max(1, min(concurrency or PAGE_CONCURRENCY, pages))
+        self.next_page: Optional[int] = None
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # Общая keep-alive сессия: без нового TCP+TLS рукопожатия на каждый фильтр
+        session = get_client().session
+        end_page = self.start_page + self.pages
+        tasks: Dict[int, asyncio.Task] = {}
+        to_schedule = self.start_page
+        try:
+            for page in range(self.start_page, end_page):
+                while to_schedule < min(end_page, page + self.window):
+                    tasks[to_schedule] = asyncio.create_task(get_items_by_model(
+                        session, self.model_id, page=to_schedule, max_price=self.max_price
+                    ))
+                    to_schedule += 1
+                try:
+                    items = await tasks.pop(page)
+                except LalafoUnavailableError:
+                    if page == self.start_page:
+                        raise
+                    logger.warning(f"Страница {page} недоступна → продолжим с неё в следующий раз.")
+                    self.next_page = page
+                    return
+                if not items:
+                    logger.info(f"Страница {page} пустая → конец объявлений.")
+                    self.next_page = 1
+                    return
+                yield items
+            self.next_page = end_page
+        finally:
+            # Запросы дальше конца ленты (или брошенного обхода) больше не нужны
+            for task in tasks.values():
+                task.cancel()
+            for task in tasks.values():
+                if task.done() and not task.cancelled():
+                    task.exception()
 
 
 async def get_all_items(model_id: int,
                         max_price: Optional[int] = None,
                         start_page: int = 1,
-                        pages: int = 3) -> Tuple[List[Dict], int]:
+                        pages: int = 3,
+                        concurrency: Optional[int] = None) -> Tuple[List[FeedItem], int]:
     """
     Загружаем несколько страниц объявлений по модели.
     Автоостановка: прекращаем при пустой странице.
     Возвращает (объявления, следующая страница).
+
+    Если API недоступно (LalafoUnavailableError) — это не конец ленты:
+    на первой странице ошибка пробрасывается, на следующих возвращаем
+    собранное и следующей страницей — недоступную (курсор не сбрасывается).
+
+    concurrency — сколько страниц запрашивать одновременно
+    (None → PAGE_CONCURRENCY, 1 → строго последовательно).
     """
-    all_items: List[Dict] = []
-    next_page = start_page + pages
+    stream = PageStream(model_id, max_price, start_page=start_page, pages=pages, concurrency=concurrency)
+    all_items: List[FeedItem] = []
+    async for items in stream:
+        all_items.extend(items)
+    return all_items, stream.next_page
 
-    async with aiohttp.ClientSession() as session:
-        for page in range(start_page, start_page + pages):
+
+def _item_id(item: FeedItem) -> Optional[int]:
+    try:
+        return int(item.get("id"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def get_items_since(model_id: int,
+                          max_price: Optional[int] = None,
+                          watermark: Optional[int] = None,
+                          max_pages: int = 5) -> Tuple[List[FeedItem], Optional[int]]:
+    """
+    Инкрементальный обход: всегда с первой (самой свежей) страницы и только
+    до уже виденных объявлений. Останавливаемся на первой странице, где нет
+    ни одного id новее watermark (поднятые/закреплённые старые объявления
+    на странице этому не мешают — смотрим на всю страницу).
+
+    Страницы идут последовательно: решение о следующей зависит от содержимого.
+    Возвращает (объявления, новый watermark = максимальный увиденный id).
+    """
+    session = get_client().session
+    all_items: List[FeedItem] = []
+    newest = watermark
+
+    for page in range(1, max_pages + 1):
+        try:
             items = await get_items_by_model(session, model_id, page=page, max_price=max_price)
-            if not items:
-                logger.info(f"Страница {page} пустая → конец объявлений.")
-                return all_items, 1
-            all_items.extend(items)
+        except LalafoUnavailableError:
+            if page == 1:
+                raise
+            logger.warning(f"Страница {page} недоступна → остановка инкрементального обхода.")
+            break
+        if not items:
+            break
+        all_items.extend(items)
 
-    return all_items, next_page
+        ids = [i for i in map(_item_id, items) if i is not None]
+        if ids:
+            page_newest = max(ids)
+            newest = page_newest if newest is None else max(newest, page_newest)
+        if watermark is not None and not any(i > watermark for i in ids):
+            logger.info(f"Модель {model_id}: страница {page} уже видена (watermark={watermark}) → стоп.")
+            break
 
+    return all_items, newest
 
-def parse_lalafo_items(items: List[Dict]) -> List[Dict]:
+
+def parse_lalafo_items(items: List[FeedItem]) -> List[ParsedAd]:
     """
-    Преобразуем объявления в удобный формат для БД и бота.
+    Преобразуем объявления в удобный формат для БД и бота (ParsedAd).
+    Принимает FeedItem из ленты (или dict того же вида — через .get).
     """
     parsed_items = []
     for item in items:
         title = item.get("title", "")
         description = item.get("description", "")
-        phone_info = extract_phone_info(title, description)
-        price = item.get("price")
-
-        parsed_items.append({
-            "lalafo_id": item.get("id"),
-            "title": title,
-            "model": phone_info.get("model"),
-            "new_price": price,
-            "author_number": item.get("mobile"),
-            "description": description,
-            "city": item.get("city"),
-            "storage": phone_info.get("storage"),
-            "battery": phone_info.get("battery"),
-            "color": phone_info.get("color"),
-            "url": f"https://lalafo.kg{item.get('url')}"
-        })
+        phone_info = extract_phone_info_fast(title, description)
+
+        parsed_items.append(ParsedAd(
+            lalafo_id=item.get("id"),
+            title=title,
+            model=phone_info.get("model"),
+            new_price=item.get("price"),
+            author_number=item.get("mobile"),
+            description=description,
+            city=item.get("city"),
+            storage=phone_info.get("storage"),
+            battery=phone_info.get("battery"),
+            storage_gb=phone_info.get("storage_gb"),
+            battery_pct=phone_info.get("battery_pct"),
+            color=phone_info.get("color"),
+            url=f"https://lalafo.kg{item.get('url')}",
+        ))
     return parsed_items
 
 
+def parse_lalafo_items_batch(items: List[FeedItem]) -> ParsedAdBatch:
+    """parse_lalafo_items по столбцам — для возврата из пула разбора"""
+    return ParsedAdBatch.from_ads(parse_lalafo_items(items))
+
+
+_parse_executor: Optional[Executor] = None
+# Вид пула, который реально используется в процессе: откат с process
+# на thread (или off) запоминается, чтобы не пересоздавать пул на каждой пачке
+_parse_pool_kind = PARSE_POOL
+
+
+def _fall_back_parse_pool(reason: str) -> None:
+    """Больше не пытаться заводить пул процессов в этом процессе"""
+    global _parse_pool_kind
+    fallback = "thread" if _parse_pool_kind == "process" else "off"
+    logger.warning(f"Пул разбора ({_parse_pool_kind}) недоступен: {reason} → дальше {fallback}")
+    _parse_pool_kind = fallback
+
+
+def _get_parse_executor() -> Optional[Executor]:
+    """
+    Пул для разбора (создаётся один раз на процесс). Процессы запускаются
+    через spawn: fork процесса с работающим event loop и потоками небезопасен.
+    В демоническом процессе (дочерний процесс Celery prefork) вместо пула
+    процессов сразу берётся пул потоков; если пул не создать вовсе — разбираем на месте.
+    """
+    global _parse_executor
+    if _parse_executor is None and _parse_pool_kind == "process" and multiprocessing.current_process().daemon:
+        _fall_back_parse_pool("демонический процесс (Celery prefork) не может запускать дочерние")
+    if _parse_executor is None and _parse_pool_kind != "off":
+        try:
+            if _parse_pool_kind == "process":
+                _parse_executor = ProcessPoolExecutor(
+                    max_workers=PARSE_POOL_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            elif _parse_pool_kind == "thread":
+                _parse_executor = ThreadPoolExecutor(
+                    max_workers=PARSE_POOL_WORKERS, thread_name_prefix="lalafo-parse"
+                )
+        except Exception as e:
+            _fall_back_parse_pool(str(e))
+            return _get_parse_executor()
+    return _parse_executor
+
+
+def shutdown_parse_executor() -> None:
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=True, cancel_futures=True)
+        _parse_executor = None
+
+
+async def parse_lalafo_items_async(items: List[FeedItem]) -> List[ParsedAd]:
+    """
+    parse_lalafo_items без блокировки event loop на больших пачках:
+    объявления делятся на чанки по PARSE_CHUNK_SIZE и разбираются в пуле
+    (LALAFO_PARSE_POOL), порядок и результат те же, что у inline-разбора.
+    """
+    executor = _get_parse_executor() if len(items) >= PARSE_OFFLOAD_MIN_ITEMS else None
+    if executor is None:
+        return parse_lalafo_items(items)
+
+    loop = asyncio.get_running_loop()
+    chunks = [items[i:i + PARSE_CHUNK_SIZE] for i in range(0, len(items), PARSE_CHUNK_SIZE)]
+    try:
+        # Из процесса чанк возвращается столбцами — меньше pickle, чем по объекту на объявление
+        parsed_chunks = await asyncio.gather(
+            *(loop.run_in_executor(executor, parse_lalafo_items_batch, chunk) for chunk in chunks)
+        )
+    except Exception as e:
+        # Например, BrokenProcessPool после OOM-kill дочернего процесса:
+        # эту пачку разбираем на месте, следующие — уже в запасном пуле
+        shutdown_parse_executor()
+        _fall_back_parse_pool(f"пул упал ({e!r})")
+        return parse_lalafo_items(items)
+    return [ad for batch in parsed_chunks for ad in batch]
+
+
 async def get_filtered_items(model_id: int,
                              max_price: Optional[int],
                              start_page: int = 1,
-                             pages: int = 3) -> Tuple[List[Dict], int]:
+                             pages: int = 3,
+                             concurrency: Optional[int] = None) -> Tuple[List[ParsedAd], int]:
     """
     Главная функция: тянем объявления по API и парсим.
     Возвращает (объявления, следующая страница).
     """
     all_items, next_page = await get_all_items(
-        model_id, max_price, start_page=start_page, pages=pages
+        model_id, max_price, start_page=start_page, pages=pages, concurrency=concurrency
     )
-    return parse_lalafo_items(all_items), next_page
+    return await parse_lalafo_items_async(all_items), next_page
+
 
+
+async def get_filtered_items_since(model_id: int,
+                                   max_price: Optional[int],
+                                   watermark: Optional[int] = None,
+                                   max_pages: int = 5) -> Tuple[List[ParsedAd], Optional[int]]:
+    """
+    Инкрементальный вариант get_filtered_items (см. get_items_since).
+    Возвращает (объявления, новый watermark).
+    """
+    all_items, newest = await get_items_since(
+        model_id, max_price, watermark=watermark, max_pages=max_pages
+    )
+    return await parse_lalafo_items_async(all_items), newest
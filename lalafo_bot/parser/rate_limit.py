@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Стартовая/минимальная/максимальная скорость запросов к lalafo.kg (запросов в секунду)
+LALAFO_RATE = float(os.getenv("LALAFO_RATE", "5"))
+LALAFO_RATE_MIN = float(os.getenv("LALAFO_RATE_MIN", "0.5"))
+LALAFO_RATE_MAX = float(os.getenv("LALAFO_RATE_MAX", "20"))
+LALAFO_BURST = int(os.getenv("LALAFO_BURST", "5"))
+
+# Сколько процессов делят лимиты выше (prefork-воркер Celery: --concurrency).
+# Лимитеры живут в каждом процессе отдельно, поэтому каждый берёт свою долю —
+# иначе N процессов вместе давали бы N × LALAFO_RATE_MAX к lalafo.kg и N × TG_GLOBAL_RATE в Telegram.
+RATE_LIMIT_PROCESSES = max(1, int(os.getenv("RATE_LIMIT_PROCESSES", os.getenv("CELERY_CONCURRENCY", "1"))))
+
+
+def process_share(rate: float) -> float:
+    """Доля общего лимита на один процесс"""
+    return rate / RATE_LIMIT_PROCESSES
+
+
+class TokenBucket:
+    """
+    Token bucket без блокировок: каждый вызов резервирует токен
+    (баланс может уйти в минус) и спит ровно столько, сколько нужно
+    на его накопление. В одном event loop это честная FIFO-очередь,
+    и объект не привязан к конкретному loop.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self) -> float:
+        """Зарезервировать токен, вернуть задержку (сек) до его выдачи"""
+        now = time.monotonic()
+        self._refill(now)
+        self._tokens -= 1
+        delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        return max(delay, self._paused_until - now)
+
+    def pause(self, seconds: float) -> None:
+        """Не выдавать токены ближайшие `seconds` секунд (например, по Retry-After)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class AdaptiveRateLimiter(TokenBucket):
+    """
+    Лимитер на хост с AIMD-подстройкой:
+    - каждый успешный ответ немного поднимает скорость (до max_rate),
+    - каждый 429/503 делит скорость пополам (не чаще раза в cooldown секунд)
+      и ставит паузу по Retry-After.
+    """
+
+    def __init__(
+        self,
+        rate: float = process_share(LALAFO_RATE),
+        burst: int = max(1, LALAFO_BURST // RATE_LIMIT_PROCESSES),
+        *,
+        min_rate: float = process_share(LALAFO_RATE_MIN),
+        max_rate: float = process_share(LALAFO_RATE_MAX),
+        increase_step: float = 0.05,
+        decrease_factor: float = 0.5,
+        cooldown: float = 1.0,
+    ):
+        super().__init__(rate, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self._last_decrease = 0.0
+
+        self.successes = 0
+        self.throttled = 0
+
+    def on_success(self) -> None:
+        self.successes += 1
+        self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after: Optional[float] = None) -> None:
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self._last_decrease >= self.cooldown and self.rate > self.min_rate:
+            self._last_decrease = now
+            old_rate = self.rate
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            logger.warning(f"Lalafo ограничивает запросы: скорость {old_rate:.2f} → {self.rate:.2f} req/s")
+        if retry_after:
+            self.pause(retry_after)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.successes + self.throttled
+        return {
+            "rate": round(self.rate, 2),
+            "successes": self.successes,
+            "throttled": self.throttled,
+            "throttle_ratio": round(self.throttled / total, 4) if total else 0.0,
+        }
+
+
+_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_rate_limiter() -> AdaptiveRateLimiter:
+    """
+    Общий лимитер процесса для всех запросов к lalafo.kg.
+    Скорости — доля процесса (см. RATE_LIMIT_PROCESSES): в сумме по воркеру не больше LALAFO_RATE_*.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = AdaptiveRateLimiter()
+    return _limiter
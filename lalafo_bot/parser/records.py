@@ -0,0 +1,91 @@
+from dataclasses import asdict, dataclass, fields
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
+
+
+@dataclass(slots=True)
+class ParsedAd:
+    """
+    Распарсенное объявление (результат parse_lalafo_items).
+
+    Без __dict__ и без ключей-строк в каждом экземпляре: в несколько раз
+    меньше памяти, чем dict с теми же полями, и быстрее доступ по атрибуту.
+    get() / [] / as_dict() оставлены для кода, который работал с dict.
+
+    После разбора объявление не меняется, но frozen=True не ставим:
+    __setattr__ через object на каждое поле делает создание в ~5 раз дороже.
+    """
+
+    lalafo_id: Union[int, str, None]
+    title: Optional[str] = None
+    model: Optional[str] = None
+    new_price: Optional[Union[int, float]] = None
+    author_number: Optional[str] = None
+    description: Optional[str] = None
+    city: Optional[str] = None
+    storage: Optional[str] = None
+    battery: Optional[str] = None
+    storage_gb: Optional[int] = None
+    battery_pct: Optional[int] = None
+    color: Optional[str] = None
+    url: Optional[str] = None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+FIELDS = tuple(f.name for f in fields(ParsedAd))
+
+
+def as_parsed_ad(payload: Union[ParsedAd, Dict[str, Any]]) -> ParsedAd:
+    """ParsedAd как есть, dict прежнего формата — в ParsedAd (лишние ключи отбрасываются)"""
+    if isinstance(payload, ParsedAd):
+        return payload
+    return ParsedAd(**{name: payload.get(name) for name in FIELDS})
+
+
+class ParsedAdBatch:
+    """
+    Пачка объявлений по столбцам: по списку на поле вместо объекта на объявление.
+    Так пачка дешевле пересылается из пула разбора (pickle одного кортежа
+    списков) и отдаёт столбец целиком — например, цены для матчинга.
+    """
+
+    __slots__ = ("columns",)
+
+    def __init__(self, columns: Optional[Dict[str, List[Any]]] = None):
+        self.columns = columns or {name: [] for name in FIELDS}
+
+    @classmethod
+    def from_ads(cls, ads: Sequence[ParsedAd]) -> "ParsedAdBatch":
+        return cls({name: [getattr(ad, name) for ad in ads] for name in FIELDS})
+
+    def append(self, ad: ParsedAd) -> None:
+        for name in FIELDS:
+            self.columns[name].append(getattr(ad, name))
+
+    def column(self, name: str) -> List[Any]:
+        return self.columns[name]
+
+    def __len__(self) -> int:
+        return len(self.columns["lalafo_id"])
+
+    def __iter__(self) -> Iterator[ParsedAd]:
+        return (ParsedAd(*values) for values in zip(*(self.columns[name] for name in FIELDS)))
+
+    def to_ads(self) -> List[ParsedAd]:
+        return list(self)
+
+    def __getstate__(self):
+        return tuple(self.columns[name] for name in FIELDS)
+
+    def __setstate__(self, state):
+        self.columns = dict(zip(FIELDS, state))
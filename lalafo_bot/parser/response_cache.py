@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+from redis import asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# memory | redis | off
+CACHE_BACKEND = os.getenv("LALAFO_CACHE_BACKEND", "memory")
+CACHE_TTL = int(os.getenv("LALAFO_CACHE_TTL", "120"))
+CACHE_MAX_SIZE = int(os.getenv("LALAFO_CACHE_MAX_SIZE", "2048"))
+CACHE_REDIS_URL = os.getenv("LALAFO_CACHE_REDIS_URL", "redis://redis:6379/1")
+
+
+def make_cache_key(params: dict) -> str:
+    """
+    Нормализованный ключ запроса: параметры сортируются и приводятся к строкам,
+    так что {"page": 1} и {"page": "1"} попадают в одну запись.
+    """
+    items = sorted((str(k), str(v)) for k, v in params.items() if v is not None)
+    return "lalafo:feed:" + urlencode(items)
+
+
+class MemoryResponseCache:
+    """
+    In-process кэш ответов ленты: TTL + LRU-вытеснение по числу записей.
+    Хранит сырое тело ответа (bytes) — компактнее, чем распарсенный JSON.
+    """
+
+    def __init__(self, ttl: int = CACHE_TTL, max_size: int = CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, body = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return body
+
+    async def set(self, key: str, body: bytes) -> None:
+        self._data[key] = (time.monotonic() + self.ttl, body)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def close(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "backend": "memory",
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisResponseCache:
+    """
+    Общий для всех воркеров кэш в Redis (тот же Redis, что у Celery, другая БД).
+    TTL выставляется самим Redis, размер ограничивается его maxmemory-политикой.
+    Ошибки Redis не ломают обход — считаются промахом.
+    """
+
+    def __init__(self, url: str = CACHE_REDIS_URL, ttl: int = CACHE_TTL):
+        self.url = url
+        self.ttl = ttl
+        self._redis = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _client(self):
+        # Соединения redis.asyncio привязаны к event loop, в котором созданы
+        loop = asyncio.get_running_loop()
+        if self._redis is None or self._loop is not loop:
+            self._redis = aioredis.from_url(self.url)
+            self._loop = loop
+        return self._redis
+
+    async def get(self, key: str) -> Optional[bytes]:
+        try:
+            body = await self._client().get(key)
+        except Exception as e:
+            self.errors += 1
+            self.misses += 1
+            logger.warning(f"Redis-кэш недоступен при чтении: {e}")
+            return None
+        if body is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body
+
+    async def set(self, key: str, body: bytes) -> None:
+        try:
+            await self._client().set(key, body, ex=self.ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis-кэш недоступен при записи: {e}")
+
+    async def close(self) -> None:
+        if self._redis is not None:
+            await self._redis.aclose()
+        self._redis = None
+        self._loop = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+        }
+
+
+_cache = None
+_cache_configured = False
+
+
+def get_response_cache():
+    """Кэш процесса согласно LALAFO_CACHE_BACKEND (None, если кэш выключен)"""
+    global _cache, _cache_configured
+    if not _cache_configured:
+        if CACHE_BACKEND == "redis":
+            _cache = RedisResponseCache()
+        elif CACHE_BACKEND == "memory":
+            _cache = MemoryResponseCache()
+        else:
+            _cache = None
+        _cache_configured = True
+    return _cache
+
+
+async def close_response_cache() -> None:
+    if _cache is not None:
+        await _cache.close()
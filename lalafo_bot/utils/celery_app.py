@@ -1,7 +1,11 @@
+from dotenv import load_dotenv
 from celery import Celery
 from celery.schedules import crontab
 from utils.logging_config import setup_logging
 
+# .env до импорта тасок: их модули читают настройки (лимиты, режимы обхода) при импорте
+load_dotenv()
+
 celery_app = Celery(
     "lalafo_bot",
     broker="redis://redis:6379/0",
@@ -18,9 +22,15 @@ celery_app.conf.update(
 )
 
 celery_app.conf.beat_schedule = {
-    "check-ads-every-15-min": {
+    # Частый запуск дешёвый: обходятся только модели, которым подошёл next_check_at
+    "check-due-filters-every-minute": {
         "task": "utils.tasks.run_process_filters",
-        "schedule": crontab(minute="*/15"),
+        "schedule": crontab(minute="*"),
+    },
+    # Ночью, когда обход почти пуст: удаление и прореживание старой истории цен
+    "compact-price-history-daily": {
+        "task": "utils.tasks.compact_price_history",
+        "schedule": crontab(hour=4, minute=30),
     },
 }
 
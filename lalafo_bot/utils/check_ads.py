@@ -1,13 +1,38 @@
+import os
+import time
 import logging
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
 from aiogram import Bot
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
-from database.session import AsyncSessionLocal
-from utils.services_for_filters import add_ad_to_filter, update_last_page, get_all_filters
+from database.session import AsyncSessionLocal, unit_of_work
+from utils.services_for_filters import (
+    link_ads_to_filter, update_last_page, update_last_pages, get_all_filters,
+    update_filter_schedules,
+)
+from utils.services_for_announcement import bulk_upsert_ads
+from utils.known_ads import get_known_ads_index
+from utils.polling import empty_notice_due
+from utils.filter_index import get_filter_index
+from utils.matching import FilterMatrix, has_extended_criteria, matches_filter
+from utils.services_for_crawl import get_watermark, deep_sweep_due, save_watermark
+from utils.services_for_prices import load_price_stats, save_price_stats
+from utils.delivery import DeliveryQueue
+from utils.digest import DigestCollector
 from parser.model_to_param import MODEL_TO_PARAM
-from parser.lalafo_parser import get_filtered_items
+from parser.records import ParsedAd, as_parsed_ad
+from parser.lalafo_parser import (
+    get_filtered_items, get_filtered_items_since, LalafoUnavailableError,
+    PageStream, parse_lalafo_items_async,
+)
+from utils.pipeline import Stage, run_pipeline
 
 logger = logging.getLogger(__name__)
 
+# Сколько страниц конвейер разбирает одновременно (имеет смысл с LALAFO_PARSE_POOL)
+PIPELINE_PARSE_WORKERS = int(os.getenv("PIPELINE_PARSE_WORKERS", "1"))
+
 
 async def send_safe(bot: Bot, user_id: int, text: str):
     """Безопасная отправка сообщений пользователю"""
@@ -17,12 +42,70 @@ async def send_safe(bot: Bot, user_id: int, text: str):
         logger.error(f"Ошибка при отправке сообщения {user_id}: {e}")
 
 
+async def notify(bot: Bot, delivery: Optional[DeliveryQueue], user_id: int, text: str):
+    """
+    Отправка уведомления: через очередь доставки (не ждёт Telegram),
+    а без очереди — сразу, как раньше.
+    """
+    if delivery is not None:
+        delivery.submit(user_id, text)
+    else:
+        await send_safe(bot, user_id, text)
+
+
+async def notify_ad(
+    bot: Bot,
+    delivery: Optional[DeliveryQueue],
+    digest: Optional[DigestCollector],
+    user_id: int,
+    status: str,
+    ad,
+    text: str,
+):
+    """Уведомление об объявлении: в дайджест прогона, если он включён, иначе сразу"""
+    if digest is not None:
+        digest.add(user_id, status, ad, text)
+    else:
+        await notify(bot, delivery, user_id, text)
+
+
+async def flush_digest(bot: Bot, delivery: Optional[DeliveryQueue], digest: Optional[DigestCollector]):
+    """Отправить накопленный дайджест (конец прогона)"""
+    if digest is None:
+        return
+    for user_id, text in digest.drain():
+        await notify(bot, delivery, user_id, text)
+
+
+def format_ad_message(status: str, ad) -> Optional[str]:
+    """Текст уведомления для статуса "new" / "price_drop" (для "seen" — None)"""
+    if status == "new":
+        return (
+            f"✨ Новое объявление!\n\n"
+            f"Название: {ad.title}\n"
+            f"Город: {ad.city or 'Неизвестно'}\n"
+            f"Цена: {ad.last_price or '—'}\n"
+            f"🔗 {ad.url}"
+        )
+    if status == "price_drop":
+        return (
+            f"⬇️ Цена упала!\n\n"
+            f"Название: {ad.title}\n"
+            f"Город: {ad.city or 'Неизвестно'}\n"
+            f"Новая цена: {ad.last_price or '—'}\n"
+            f"🔗 {ad.url}"
+        )
+    return None
+
+
 async def process_single_filter(
     session: AsyncSession,
     bot: Bot,
     flt,
     pages_per_run: int,
     send_empty: bool = False,
+    delivery: Optional[DeliveryQueue] = None,
+    digest: Optional[DigestCollector] = None,
 ):
     """
     Обрабатывает один фильтр:
@@ -30,7 +113,8 @@ async def process_single_filter(
     - Загружает N страниц подряд,
     - Если встречает пустую страницу → сбрасывает last_page = 1,
     - Иначе сохраняет last_page = следующая страница,
-    - Шлёт новые объявления или уведомление об отсутствии новых (если send_empty=True).
+    - Шлёт новые объявления или уведомление об отсутствии новых (если send_empty=True
+      и фильтр не проверялся дольше EMPTY_NOTICE_INTERVAL, см. utils/polling.py).
     """
     model_param = MODEL_TO_PARAM.get(flt.model)
     if not model_param:
@@ -38,59 +122,485 @@ async def process_single_filter(
 
     start_page = flt.last_page or 1
 
-    ads, next_page = await get_filtered_items(
+    try:
+        ads, next_page = await get_filtered_items(
+            model_param,
+            max_price=flt.max_price,
+            start_page=start_page,
+            pages=pages_per_run,
+        )
+    except LalafoUnavailableError as e:
+        # Троттлинг — не «пустая лента»: last_page не трогаем, попробуем в следующий раз
+        logger.warning(f"Фильтр {flt.id}: Lalafo недоступно ({e.status}), пропускаем прогон")
+        return
+
+    # Весь прогон фильтра — одна транзакция; уведомления только после commit
+    messages: List[Tuple[str, object, str]] = []
+    upserted = []
+    index = get_known_ads_index()
+    price_stats = None
+    if flt.max_price is None or flt.below_median_pct is not None:
+        price_stats = await load_price_stats(session, model_param)
+        # Лента, обрезанная по цене, исказила бы медиану — её не учитываем
+        if flt.max_price is None:
+            price_stats.observe(ads)
+    # Лента фильтруется API только по цене, остальные критерии проверяем сами
+    matched_ads = (
+        [ad for ad in ads if matches_filter(flt, ad, price_stats)] if has_extended_criteria(flt) else ads
+    )
+    async with unit_of_work(session):
+        if matched_ads:
+            upserted = [ad for _, ad in await bulk_upsert_ads(session, matched_ads, commit=False, index=index)]
+            linked = await link_ads_to_filter(session, filter_id=flt.id, ads=upserted, commit=False)
+            for status, ad in linked:
+                msg = format_ad_message(status, ad)
+                if msg:
+                    messages.append((status, ad, msg))
+        await update_last_page(session, flt.id, next_page if ads else 1, commit=False)
+        if price_stats is not None:
+            await save_price_stats(session, price_stats, commit=False)
+    index.update_from(upserted)
+
+    for status, ad, msg in messages:
+        await notify_ad(bot, delivery, digest, flt.user_id, status, ad, msg)
+
+    if send_empty and not messages and empty_notice_due(flt.last_checked_at):
+        await notify(bot, delivery, flt.user_id, f"ℹ️ По фильтру «{flt.model}» новых объявлений нет.")
+
+
+def empty_notice_filters(filters, send_empty: bool) -> set:
+    """
+    ID фильтров, которым после прогона можно сообщить «новых объявлений нет».
+    Считается до update_filter_schedules — по last_checked_at предыдущей проверки.
+    """
+    if not send_empty:
+        return set()
+    return {flt.id for flt in filters if empty_notice_due(flt.last_checked_at)}
+
+
+def group_filters_by_model(filters) -> Dict[int, List]:
+    """
+    Группирует фильтры по id модели Lalafo (MODEL_TO_PARAM).
+    Фильтры с неизвестной моделью пропускаются.
+    """
+    groups: Dict[int, List] = defaultdict(list)
+    for flt in filters:
+        model_param = MODEL_TO_PARAM.get(flt.model)
+        if model_param:
+            groups[model_param].append(flt)
+    return groups
+
+
+def group_max_price(filters) -> Optional[int]:
+    """
+    Цена для push-down в price[to]: максимум по группе.
+    Если хотя бы у одного фильтра цена не задана — ограничения нет.
+    Фильтру с below_median_pct нужна вся лента: по ней считается медиана модели.
+    """
+    prices = [flt.max_price for flt in filters]
+    if any(p is None for p in prices) or any(getattr(flt, "below_median_pct", None) is not None for flt in filters):
+        return None
+    return max(prices)
+
+
+def new_run_summary(model_param: Optional[int], filters) -> Dict[str, Any]:
+    """
+    Сводка прогона модели: сколько объявлений пришло из ленты и подошло фильтрам,
+    сколько из них новых / подешевевших для фильтров, сколько уведомлений
+    отправлено, число ошибок и длительность. Сводки складываются merge_run_summaries.
+    """
+    return {
+        "model": model_param,
+        "filters": len(filters),
+        "ads_seen": 0,
+        "ads_matched": 0,
+        "new": 0,
+        "price_drop": 0,
+        "notified": 0,
+        "errors": 0,
+        "duration": 0.0,
+    }
+
+
+def finish_run_summary(summary: Dict[str, Any], started: float) -> Dict[str, Any]:
+    summary["duration"] = round(time.monotonic() - started, 3)
+    logger.info(f"Модель {summary['model']}: {summary}")
+    return summary
+
+
+def merge_run_summaries(summaries) -> Dict[str, Any]:
+    """Общая сводка цикла; duration — самый долгий прогон (прогоны идут параллельно)"""
+    total = new_run_summary(None, [])
+    total.pop("model")
+    total["models"] = 0
+    for summary in summaries:
+        if not summary:
+            continue
+        total["models"] += 1
+        for key in ("filters", "ads_seen", "ads_matched", "new", "price_drop", "notified", "errors"):
+            total[key] += summary.get(key, 0)
+        total["duration"] = max(total["duration"], summary.get("duration", 0.0))
+    return total
+
+
+def match_ads(
+    model_param: int,
+    filters,
+    ads: List[ParsedAd],
+    price_stats=None,
+) -> Tuple[List[ParsedAd], Dict[str, List]]:
+    """
+    Раздать объявления фильтрам группы в памяти.
+    price_stats (ModelPriceStats) — медианы для фильтров с below_median_pct.
+    Возвращает (объявления, подошедшие хоть одному фильтру; lalafo_id → фильтры).
+    """
+    ads = [as_parsed_ad(ad) for ad in ads]
+    if any(has_extended_criteria(flt) for flt in filters):
+        # Есть критерии кроме цены — вся страница против всех фильтров одной матричной операцией
+        matched_per_ad = FilterMatrix(filters).matched_filters(ads, price_stats)
+    else:
+        # Только цена — фильтры под объявление бисекцией по max_price, а не перебором группы
+        filter_index = get_filter_index()
+        filter_index.sync_model(model_param, filters)
+        filters_by_id = {flt.id: flt for flt in filters}
+        matched_per_ad = [
+            [filters_by_id[filter_id] for filter_id in filter_index.match(model_param, ad.new_price)]
+            for ad in ads
+        ]
+    matches: Dict[str, List] = {}
+    payloads = []
+    for ad, matched in zip(ads, matched_per_ad):
+        if matched:
+            matches[str(ad.lalafo_id)] = matched
+            payloads.append(ad)
+    return payloads, matches
+
+
+async def persist_matches(
+    session: AsyncSession,
+    filters,
+    payloads: List[ParsedAd],
+    matches: Dict[str, List],
+    index,
+    summary: Dict[str, Any],
+) -> Tuple[List, Dict[int, List[Tuple[str, object, str]]]]:
+    """
+    Сохранить объявления и привязать их к фильтрам (внутри unit_of_work, без commit).
+    Возвращает (сохранённые объявления, {filter.id: [(статус, объявление, текст)]}).
+    """
+    messages: Dict[int, List[Tuple[str, object, str]]] = {flt.id: [] for flt in filters}
+    # Одна пачка INSERT ... ON CONFLICT на всю группу вместо запросов на каждое объявление,
+    # известные индексу объявления без падения цены в БД вообще не идут
+    upserted = [ad for _, ad in await bulk_upsert_ads(session, payloads, commit=False, index=index)]
+    ads_by_filter: Dict[int, List] = defaultdict(list)
+    for ad in upserted:
+        for flt in matches[ad.lalafo_id]:
+            ads_by_filter[flt.id].append(ad)
+
+    for flt in filters:
+        if not ads_by_filter[flt.id]:
+            continue
+        try:
+            async with session.begin_nested():
+                linked = await link_ads_to_filter(
+                    session, filter_id=flt.id, ads=ads_by_filter[flt.id], commit=False
+                )
+        except SQLAlchemyError:
+            logger.exception(f"Фильтр {flt.id}: не удалось привязать объявления")
+            summary["errors"] += 1
+            continue
+        for status, ad in linked:
+            msg = format_ad_message(status, ad)
+            if msg:
+                messages[flt.id].append((status, ad, msg))
+                summary[status] += 1
+    return upserted, messages
+
+
+async def process_model_group(
+    session: AsyncSession,
+    bot: Bot,
+    model_param: int,
+    filters,
+    pages_per_run: int,
+    send_empty: bool = False,
+    incremental: bool = False,
+    delivery: Optional[DeliveryQueue] = None,
+    digest: Optional[DigestCollector] = None,
+    streaming: bool = False,
+):
+    """
+    Обрабатывает все фильтры одной модели за один обход:
+    - Загружает N страниц модели один раз (price[to] = максимум цен группы),
+    - Сохраняет все объявления в БД одной пачкой (bulk_upsert_ads),
+    - Раздаёт объявления фильтрам в памяти по их max_price (FilterPriceIndex),
+    - Учитывает цены в скетче модели (utils/price_stats.py), если лента не обрезана по цене,
+    - Двигает last_page всех фильтров группы вместе,
+    - Пересчитывает hit_rate и next_check_at фильтров (адаптивный опрос),
+    - Коммитит один раз в конце (unit_of_work), уведомления — после commit.
+
+    incremental=True: каждый прогон начинается с самых свежих объявлений и
+    идёт только до watermark модели (см. get_items_since), а глубокий проход
+    по last_page делается раз в DEEP_SWEEP_INTERVAL — ради падений цен.
+
+    streaming=True: проход по last_page (в incremental — глубокий) идёт
+    постранично через конвейер — см. process_model_group_streaming.
+    Голова ленты до watermark короткая и забирается, как и без streaming, одним запросом.
+
+    Возвращает сводку прогона (см. new_run_summary).
+    """
+    started = time.monotonic()
+    summary = new_run_summary(model_param, filters)
+    empty_notice = empty_notice_filters(filters, send_empty)
+    max_price = group_max_price(filters)
+    ads: List[dict] = []
+    next_page: Optional[int] = None
+    newest_id: Optional[int] = None
+    deep = True
+
+    if incremental:
+        watermark = await get_watermark(session, model_param)
+        deep = deep_sweep_due(watermark)
+        try:
+            ads, newest_id = await get_filtered_items_since(
+                model_param,
+                max_price=max_price,
+                watermark=watermark.newest_lalafo_id if watermark else None,
+                max_pages=pages_per_run,
+            )
+        except LalafoUnavailableError as e:
+            logger.warning(f"Модель {model_param}: Lalafo недоступно ({e.status}), пропускаем прогон")
+            summary["errors"] += 1
+            return finish_run_summary(summary, started)
+
+    if streaming and deep:
+        return await process_model_group_streaming(
+            session, bot, model_param, filters,
+            pages_per_run=pages_per_run,
+            send_empty=send_empty,
+            delivery=delivery,
+            digest=digest,
+            incremental=incremental,
+            head=ads,
+            newest_id=newest_id,
+        )
+
+    # Медиану считаем только по необрезанной ленте (без price[to])
+    price_stats = await load_price_stats(session, model_param) if max_price is None else None
+    if deep:
+        start_page = min(flt.last_page or 1 for flt in filters)
+        try:
+            deep_ads, next_page = await get_filtered_items(
+                model_param,
+                max_price=max_price,
+                start_page=start_page,
+                pages=pages_per_run,
+            )
+            ads = ads + deep_ads
+        except LalafoUnavailableError as e:
+            logger.warning(f"Модель {model_param}: Lalafo недоступно ({e.status}), пропускаем прогон")
+            summary["errors"] += 1
+            if not incremental:
+                return finish_run_summary(summary, started)
+
+    if price_stats is not None:
+        price_stats.observe(ads)
+    payloads, matches = match_ads(model_param, filters, ads, price_stats)
+
+    # Вся группа — одна транзакция, каждый фильтр под своим SAVEPOINT:
+    # ошибка одного фильтра не откатывает остальных
+    index = get_known_ads_index()
+    async with unit_of_work(session):
+        upserted, messages = await persist_matches(session, filters, payloads, matches, index, summary)
+
+        if next_page is not None:
+            await update_last_pages(session, [flt.id for flt in filters], next_page, commit=False)
+        # Следующая проверка модели — по тому, сколько совпадений она сейчас даёт
+        await update_filter_schedules(
+            session, filters, {flt.id: len(messages[flt.id]) for flt in filters}, commit=False
+        )
+        if incremental:
+            await save_watermark(
+                session, model_param,
+                newest_lalafo_id=newest_id,
+                deep_swept=next_page is not None,
+                commit=False,
+            )
+        if price_stats is not None:
+            await save_price_stats(session, price_stats, commit=False)
+    index.update_from(upserted)
+    summary["ads_seen"] = len(ads)
+    summary["ads_matched"] = len(upserted)
+
+    for flt in filters:
+        for status, ad, msg in messages[flt.id]:
+            await notify_ad(bot, delivery, digest, flt.user_id, status, ad, msg)
+            summary["notified"] += 1
+        if flt.id in empty_notice and not messages[flt.id]:
+            await notify(bot, delivery, flt.user_id, f"ℹ️ По фильтру «{flt.model}» новых объявлений нет.")
+
+    return finish_run_summary(summary, started)
+
+
+async def process_model_group_streaming(
+    session: AsyncSession,
+    bot: Bot,
+    model_param: int,
+    filters,
+    pages_per_run: int,
+    send_empty: bool = False,
+    delivery: Optional[DeliveryQueue] = None,
+    digest: Optional[DigestCollector] = None,
+    incremental: bool = False,
+    head: Optional[List[ParsedAd]] = None,
+    newest_id: Optional[int] = None,
+):
+    """
+    Потоковый вариант process_model_group: страница → разбор → запись → уведомления.
+
+    Каждая страница идёт дальше, как только пришла (PageStream), стадии
+    связаны очередями ограниченного размера (utils/pipeline.py), поэтому
+    в памяти лишь несколько страниц, а первое уведомление уходит после
+    первой страницы, а не после всего обхода. Цена этого — commit на каждую
+    страницу вместо одного на группу; last_page и расписание фильтров
+    пишутся отдельной транзакцией в конце.
+
+    С дайджестом (DIGEST_MODE) он сбрасывается после каждой страницы:
+    иначе совпадения ждали бы конца таски и ранней отправки не было бы.
+    Сводка пользователю при этом — постраничная, а не за весь цикл.
+
+    incremental=True — это глубокий проход инкрементального обхода:
+    head (уже разобранная голова ленты до watermark) обрабатывается
+    первой пачкой, а в конце сохраняется watermark с newest_id.
+    """
+    started = time.monotonic()
+    summary = new_run_summary(model_param, filters)
+    empty_notice = empty_notice_filters(filters, send_empty)
+    max_price = group_max_price(filters)
+    price_stats = await load_price_stats(session, model_param) if max_price is None else None
+    stream = PageStream(
         model_param,
-        max_price=flt.max_price,
-        start_page=start_page,
+        max_price=max_price,
+        start_page=min(flt.last_page or 1 for flt in filters),
         pages=pages_per_run,
     )
+    index = get_known_ads_index()
+    hits: Dict[int, int] = {flt.id: 0 for flt in filters}
 
-    if not ads:
-        await update_last_page(session, flt.id, 1)
-        await session.commit()
-        if send_empty:
-            await send_safe(bot, flt.user_id, f"ℹ️ По фильтру «{flt.model}» новых объявлений нет.")
-        return
+    def route(ads):
+        summary["ads_seen"] += len(ads)
+        if price_stats is not None:
+            price_stats.observe(ads)
+        payloads, matches = match_ads(model_param, filters, ads, price_stats)
+        return (payloads, matches) if payloads else None
 
-    new_ads_count = 0
-    for ad_payload in ads:
-        status, ad = await add_ad_to_filter(session, filter_id=flt.id, ad_payload=ad_payload)
-
-        if status == "new":
-            new_ads_count += 1
-            msg = (
-                f"✨ Новое объявление!\n\n"
-                f"Название: {ad.title}\n"
-                f"Город: {ad.city or 'Неизвестно'}\n"
-                f"Цена: {ad.last_price or '—'}\n"
-                f"🔗 {ad.url}"
-            )
-            await send_safe(bot, flt.user_id, msg)
-
-        elif status == "price_drop":
-            new_ads_count += 1
-            msg = (
-                f"⬇️ Цена упала!\n\n"
-                f"Название: {ad.title}\n"
-                f"Город: {ad.city or 'Неизвестно'}\n"
-                f"Новая цена: {ad.last_price or '—'}\n"
-                f"🔗 {ad.url}"
+    async def parse(items):
+        return route(await parse_lalafo_items_async(items))
+
+    async def persist(batch):
+        payloads, matches = batch
+        async with unit_of_work(session):
+            upserted, messages = await persist_matches(session, filters, payloads, matches, index, summary)
+        index.update_from(upserted)
+        summary["ads_matched"] += len(upserted)
+        return [(flt, item) for flt in filters for item in messages[flt.id]] or None
+
+    async def send(batch):
+        for flt, (status, ad, msg) in batch:
+            await notify_ad(bot, delivery, digest, flt.user_id, status, ad, msg)
+            hits[flt.id] += 1
+            summary["notified"] += 1
+        await flush_digest(bot, delivery, digest)
+
+    if head:
+        batch = route(head)
+        sent = await persist(batch) if batch else None
+        if sent:
+            await send(sent)
+
+    try:
+        stages = await run_pipeline(stream, [
+            Stage("parse", parse, workers=PIPELINE_PARSE_WORKERS),
+            Stage("persist", persist),
+            Stage("notify", send),
+        ])
+        logger.info(f"Модель {model_param}: конвейер {stages}")
+    except LalafoUnavailableError as e:
+        logger.warning(f"Модель {model_param}: Lalafo недоступно ({e.status}), пропускаем прогон")
+        summary["errors"] += 1
+        # Голова ленты уже записана — без watermark следующий прогон прошёл бы её заново
+        if not incremental:
+            return finish_run_summary(summary, started)
+
+    async with unit_of_work(session):
+        if stream.next_page is not None:
+            await update_last_pages(session, [flt.id for flt in filters], stream.next_page, commit=False)
+        await update_filter_schedules(session, filters, hits, commit=False)
+        if incremental:
+            await save_watermark(
+                session, model_param,
+                newest_lalafo_id=newest_id,
+                deep_swept=stream.next_page is not None,
+                commit=False,
             )
-            await send_safe(bot, flt.user_id, msg)
+        if price_stats is not None:
+            await save_price_stats(session, price_stats, commit=False)
 
-    await update_last_page(session, flt.id, next_page)
-    await session.commit()
+    for flt in filters:
+        if flt.id in empty_notice and not hits[flt.id]:
+            await notify(bot, delivery, flt.user_id, f"ℹ️ По фильтру «{flt.model}» новых объявлений нет.")
 
-    if send_empty and new_ads_count == 0:
-        await send_safe(bot, flt.user_id, f"ℹ️ По фильтру «{flt.model}» новых объявлений нет.")
+    return finish_run_summary(summary, started)
 
 
-async def process_filters(bot: Bot):
+async def process_filters_grouped(
+    session: AsyncSession,
+    bot: Bot,
+    filters,
+    pages_per_run: int,
+    send_empty: bool = False,
+    incremental: bool = False,
+    delivery: Optional[DeliveryQueue] = None,
+    digest: Optional[DigestCollector] = None,
+    streaming: bool = False,
+):
+    """
+    Цикл по моделям вместо цикла по фильтрам:
+    число запросов к API — O(моделей), а не O(фильтров).
+    """
+    groups = group_filters_by_model(filters)
+    logger.info(f"Фильтров: {len(filters)}, моделей к обходу: {len(groups)}")
+
+    summaries = []
+    for model_param, group in groups.items():
+        try:
+            summary = await process_model_group(
+                session, bot, model_param, group,
+                pages_per_run=pages_per_run,
+                send_empty=send_empty,
+                incremental=incremental,
+                delivery=delivery,
+                digest=digest,
+                streaming=streaming,
+            )
+        except Exception:
+            logger.exception(f"Ошибка обработки модели {model_param}")
+            summary = new_run_summary(model_param, group)
+            summary["errors"] += 1
+        summaries.append(summary)
+    return merge_run_summaries(summaries)
+
+
+async def process_filters(bot: Bot, group_by_model: bool = True):
     """
     Проходит по всем фильтрам из БД и обрабатывает их (запуск планировщика).
     """
     async with AsyncSessionLocal() as session:
         filters = await get_all_filters(session)
+        if group_by_model:
+            await process_filters_grouped(session, bot, filters, pages_per_run=3, send_empty=True)
+            return
+
         for flt in filters:
             try:
                 await process_single_filter(session, bot, flt, pages_per_run=3, send_empty=True)
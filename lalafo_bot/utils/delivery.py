@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+import logging
+from typing import Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter, TelegramNetworkError, TelegramServerError
+
+from parser.rate_limit import TokenBucket, process_share
+
+logger = logging.getLogger(__name__)
+
+# Лимиты Telegram: ~30 сообщений/сек на бота и ~1 сообщение/сек в один чат.
+# TG_GLOBAL_RATE — на весь воркер: процесс prefork-пула получает свою долю (RATE_LIMIT_PROCESSES)
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "25"))
+TG_PER_CHAT_INTERVAL = float(os.getenv("TG_PER_CHAT_INTERVAL", "1.0"))
+TG_DELIVERY_WORKERS = int(os.getenv("TG_DELIVERY_WORKERS", "4"))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3"))
+
+
+class DeliveryQueue:
+    """
+    Асинхронная очередь отправки сообщений в Telegram.
+
+    Обход Lalafo только кладёт сообщение в очередь (submit) и идёт дальше,
+    а воркеры очереди отправляют его параллельно, соблюдая глобальный лимит
+    бота и интервал на чат. TelegramRetryAfter ставит всю отправку на паузу
+    и повторяет сообщение; ошибки сети/сервера повторяются с задержкой.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        *,
+        global_rate: float = process_share(TG_GLOBAL_RATE),
+        per_chat_interval: float = TG_PER_CHAT_INTERVAL,
+        workers: int = TG_DELIVERY_WORKERS,
+        max_retries: int = TG_MAX_RETRIES,
+    ):
+        self.bot = bot
+        self.per_chat_interval = per_chat_interval
+        self.workers = workers
+        self.max_retries = max_retries
+
+        self._bucket = TokenBucket(global_rate, burst=max(1, int(global_rate)))
+        self._chat_next: Dict[int, float] = {}
+        self._queue: "asyncio.Queue[Tuple[int, str, float]]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+        self.throttle_events = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    async def start(self) -> "DeliveryQueue":
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self
+
+    def submit(self, chat_id: int, text: str) -> None:
+        """Поставить сообщение в очередь (не блокирует обход)"""
+        self._queue.put_nowait((chat_id, text, time.monotonic()))
+
+    async def close(self) -> None:
+        """Дождаться отправки всего, что в очереди, и остановить воркеры"""
+        if self._tasks:
+            await self._queue.join()
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+            self._tasks = []
+        logger.info(f"Очередь доставки закрыта: {self.stats()}")
+
+    async def _wait_chat_slot(self, chat_id: int) -> None:
+        # Резервируем слот чата до сна, чтобы параллельные воркеры не отправили в тот же чат разом
+        now = time.monotonic()
+        slot = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = slot + self.per_chat_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _send(self, chat_id: int, text: str, enqueued_at: float) -> None:
+        for attempt in range(self.max_retries + 1):
+            await self._wait_chat_slot(chat_id)
+            await self._bucket.acquire()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+            except TelegramRetryAfter as e:
+                self.throttle_events += 1
+                self._bucket.pause(e.retry_after)
+                self._chat_next[chat_id] = time.monotonic() + e.retry_after
+                logger.warning(f"Flood control Telegram (чат {chat_id}): пауза {e.retry_after}с")
+            except (TelegramNetworkError, TelegramServerError) as e:
+                logger.warning(f"Временная ошибка отправки в {chat_id}: {e}")
+                await asyncio.sleep(min(30, 2 ** attempt))
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Ошибка при отправке сообщения {chat_id}: {e}")
+                return
+            else:
+                latency = time.monotonic() - enqueued_at
+                self.sent += 1
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                return
+            self.retries += 1
+
+        self.failed += 1
+        logger.error(f"Сообщение в {chat_id} не отправлено после {self.max_retries} повторов")
+
+    async def _worker(self) -> None:
+        while True:
+            chat_id, text, enqueued_at = await self._queue.get()
+            try:
+                await self._send(chat_id, text, enqueued_at)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+            "throttle_events": self.throttle_events,
+            "latency_avg": round(self.latency_total / self.sent, 3) if self.sent else 0.0,
+            "latency_max": round(self.latency_max, 3),
+        }
+
@@ -0,0 +1,135 @@
+import os
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Лимит длины текста сообщения в Telegram
+TG_MESSAGE_LIMIT = 4096
+# Режим дайджеста: все совпадения пользователя за прогон — одним/несколькими сообщениями.
+# Потоковый обход (STREAMING_PIPELINE) сбрасывает дайджест после каждой страницы —
+# там сводка постраничная, зато первое уведомление не ждёт конца обхода
+DIGEST_MODE = os.getenv("DIGEST_MODE", "1") == "1"
+
+_STATUS_ICONS = {"new": "✨", "price_drop": "⬇️"}
+
+
+def format_digest_entry(status: str, ad) -> str:
+    """Короткая запись об объявлении внутри дайджеста"""
+    icon = _STATUS_ICONS.get(status, "•")
+    return (
+        f"{icon} {ad.title}\n"
+        f"{ad.city or 'Неизвестно'} · {ad.last_price or '—'}\n"
+        f"🔗 {ad.url}"
+    )
+
+
+def split_message(header: str, entries: List[str], limit: int = TG_MESSAGE_LIMIT) -> List[str]:
+    """
+    Склеивает записи в сообщения не длиннее limit, не разрывая записи.
+    Заголовок ставится только в первое сообщение; слишком длинная
+    запись обрезается.
+    """
+    chunks: List[str] = []
+    current = header
+    for entry in entries:
+        if len(entry) > limit:
+            entry = entry[:limit - 1] + "…"
+        candidate = f"{current}\n\n{entry}" if current else entry
+        if len(candidate) <= limit:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+        current = entry
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class DigestCollector:
+    """
+    Копит совпадения по пользователям в течение прогона и отдаёт их
+    несколькими сводными сообщениями вместо сообщения на каждое объявление.
+
+    Одно объявление, найденное двумя фильтрами пользователя, попадает
+    в дайджест один раз. Если у пользователя одно совпадение — уходит
+    обычное уведомление (text из add).
+
+    Запись дайджеста форматируется сразу в add: дальше хранятся только
+    строки, так что дайджест можно передать между процессами (export/merge —
+    подзадачи обхода по моделям отдают его в summarize_crawl).
+    """
+
+    def __init__(self, limit: int = TG_MESSAGE_LIMIT):
+        self.limit = limit
+        # user_id → {ad.id: (status, запись дайджеста, text)} в порядке поступления
+        self._hits: Dict[int, "OrderedDict[int, Tuple[str, str, str]]"] = {}
+        self.added = 0
+        self.duplicates = 0
+
+    def add(self, user_id: int, status: str, ad, text: str) -> None:
+        self._add(user_id, ad.id, status, format_digest_entry(status, ad), text)
+
+    def _add(self, user_id: int, ad_id: int, status: str, entry: str, text: str) -> None:
+        hits = self._hits.setdefault(user_id, OrderedDict())
+        self.added += 1
+        if ad_id in hits:
+            self.duplicates += 1
+            # Падение цены важнее «нового»: оставляем более сильный статус
+            if status == "price_drop" and hits[ad_id][0] != "price_drop":
+                hits[ad_id] = (status, entry, text)
+            return
+        hits[ad_id] = (status, entry, text)
+
+    def export(self) -> List[list]:
+        """
+        Забрать совпадения без отправки: [[user_id, ad_id, status, запись, text], ...]
+        (JSON — годится для результата Celery). Дайджест очищается.
+        """
+        rows = [
+            [user_id, ad_id, status, entry, text]
+            for user_id, hits in self._hits.items()
+            for ad_id, (status, entry, text) in hits.items()
+        ]
+        self._hits.clear()
+        self.added = 0
+        self.duplicates = 0
+        return rows
+
+    def merge(self, rows: Iterable[list]) -> None:
+        """Добавить совпадения, выгруженные export() в другом процессе"""
+        for user_id, ad_id, status, entry, text in rows:
+            self._add(user_id, ad_id, status, entry, text)
+
+    def has_hits(self, user_id: int) -> bool:
+        return bool(self._hits.get(user_id))
+
+    def __len__(self) -> int:
+        return sum(len(hits) for hits in self._hits.values())
+
+    def drain(self) -> List[Tuple[int, str]]:
+        """Забрать готовые сообщения [(user_id, text)] и очистить дайджест"""
+        messages: List[Tuple[int, str]] = []
+        for user_id, hits in self._hits.items():
+            if not hits:
+                continue
+            if len(hits) == 1:
+                _, _, text = next(iter(hits.values()))
+                messages.append((user_id, text))
+                continue
+            new_count = sum(1 for status, _, _ in hits.values() if status == "new")
+            drop_count = len(hits) - new_count
+            header = f"📬 Подборка объявлений: новых — {new_count}, подешевело — {drop_count}"
+            entries = [entry for _, entry, _ in hits.values()]
+            messages.extend((user_id, chunk) for chunk in split_message(header, entries, self.limit))
+
+        if messages:
+            logger.info(
+                f"Дайджест: {self.added} совпадений ({self.duplicates} дублей) → {len(messages)} сообщений"
+            )
+        self._hits.clear()
+        self.added = 0
+        self.duplicates = 0
+        return messages
@@ -0,0 +1,137 @@
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _ModelBucket:
+    """
+    Фильтры одной модели: max_price по возрастанию в компактных массивах
+    (prices[i] — цена фильтра ids[i]) и отдельно фильтры без ограничения цены.
+    members — те же фильтры как {id: max_price}, для сверки в sync_model.
+    """
+    __slots__ = ("prices", "ids", "unbounded", "members")
+
+    def __init__(self):
+        self.prices = array("q")
+        self.ids = array("q")
+        self.unbounded = array("q")
+        self.members: Dict[int, Optional[int]] = {}
+
+    def add(self, filter_id: int, max_price: Optional[int]) -> None:
+        self.members[filter_id] = max_price
+        if max_price is None:
+            self.unbounded.append(filter_id)
+            return
+        pos = bisect_right(self.prices, max_price)
+        self.prices.insert(pos, max_price)
+        self.ids.insert(pos, filter_id)
+
+    def remove(self, filter_id: int, max_price: Optional[int]) -> bool:
+        self.members.pop(filter_id, None)
+        if max_price is None:
+            if filter_id in self.unbounded:
+                self.unbounded.remove(filter_id)
+                return True
+            return False
+        pos = bisect_left(self.prices, max_price)
+        while pos < len(self.prices) and self.prices[pos] == max_price:
+            if self.ids[pos] == filter_id:
+                del self.prices[pos]
+                del self.ids[pos]
+                return True
+            pos += 1
+        return False
+
+    def match(self, price: Optional[int]) -> List[int]:
+        if price is None:
+            # Объявление без цены подходит только фильтрам без max_price
+            return list(self.unbounded)
+        pos = bisect_left(self.prices, price)
+        return list(self.unbounded) + list(self.ids[pos:])
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.unbounded)
+
+
+class FilterPriceIndex:
+    """
+    Обратный индекс «объявление → подходящие фильтры».
+
+    Фильтры разложены по id модели Lalafo и внутри отсортированы по max_price,
+    поэтому фильтры, под которые проходит объявление (price <= max_price),
+    — это хвост массива после bisect, а не перебор всех фильтров модели.
+
+    Индекс живёт в каждом процессе воркера отдельно, а фильтры создаёт
+    и удаляет бот (другой процесс), поэтому единственный источник правды —
+    sync_model: перед матчингом группа фильтров модели, только что
+    прочитанная из БД, сверяется с корзиной.
+    """
+
+    def __init__(self):
+        self._models: Dict[int, _ModelBucket] = {}
+        # filter_id → (model_param, max_price): где лежит фильтр, для удаления
+        self._where: Dict[int, Tuple[int, Optional[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def _add(self, model_param: int, filter_id: int, max_price: Optional[int]) -> None:
+        if filter_id in self._where:
+            self.remove(filter_id)
+        self._models.setdefault(model_param, _ModelBucket()).add(filter_id, max_price)
+        self._where[filter_id] = (model_param, max_price)
+
+    def remove(self, filter_id: int) -> bool:
+        location = self._where.pop(filter_id, None)
+        if location is None:
+            return False
+        model_param, max_price = location
+        return self._models[model_param].remove(filter_id, max_price)
+
+    def sync_model(self, model_param: int, filters: Iterable) -> None:
+        """
+        Привести корзину модели к актуальному списку фильтров (из БД).
+
+        Набор {id: max_price} сверяется с тем, что уже лежит в корзине, и
+        меняется только разница: удалённые и изменённые фильтры снимаются,
+        новые вставляются бисекцией — корзина целиком не перестраивается.
+        Цена сверки — один проход по фильтрам группы на каждый вызов.
+        """
+        wanted = {flt.id: flt.max_price for flt in filters}
+        bucket = self._models.get(model_param)
+        current = bucket.members if bucket is not None else {}
+        if wanted == current:
+            return
+        for filter_id, max_price in list(current.items()):
+            if filter_id not in wanted or wanted[filter_id] != max_price:
+                self.remove(filter_id)
+        for filter_id, max_price in wanted.items():
+            if self._where.get(filter_id) != (model_param, max_price):
+                self._add(model_param, filter_id, max_price)
+
+    def match(self, model_param: int, price: Optional[int]) -> List[int]:
+        """ID фильтров модели, под которые проходит объявление с такой ценой"""
+        bucket = self._models.get(model_param)
+        if bucket is None:
+            return []
+        return bucket.match(price)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "models": len(self._models),
+            "filters": len(self._where),
+        }
+
+
+_index: Optional[FilterPriceIndex] = None
+
+
+def get_filter_index() -> FilterPriceIndex:
+    """Индекс процесса (один на воркер/бота)"""
+    global _index
+    if _index is None:
+        _index = FilterPriceIndex()
+    return _index
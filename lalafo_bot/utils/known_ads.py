@@ -0,0 +1,137 @@
+import os
+import sys
+import logging
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Ad
+
+logger = logging.getLogger(__name__)
+
+KNOWN_ADS_MAX_SIZE = int(os.getenv("KNOWN_ADS_MAX_SIZE", "200000"))
+
+
+class KnownAd(NamedTuple):
+    """
+    Лёгкая замена Ad для объявлений, которые не пришлось читать из БД:
+    те же атрибуты, что использует привязка к фильтрам и уведомления.
+    """
+    id: int
+    lalafo_id: str
+    title: Optional[str]
+    city: Optional[str]
+    url: Optional[str]
+    last_price: Optional[int]
+
+
+class KnownAdsIndex:
+    """
+    In-memory индекс lalafo_id → (ad.id, last_price) с LRU-вытеснением.
+
+    Объявление, которое уже есть в индексе и цена которого не упала,
+    не требует ни SELECT, ни записи в БД. Индекс прогревается из таблицы ads
+    при старте воркера и обновляется по результатам записей.
+    Числовые lalafo_id хранятся как int — это заметно компактнее строк.
+    """
+
+    def __init__(self, max_size: int = KNOWN_ADS_MAX_SIZE):
+        self.max_size = max_size
+        self._data: "OrderedDict[Union[int, str], Tuple[int, Optional[int]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.warmed = False
+
+    @staticmethod
+    def _key(lalafo_id) -> Union[int, str]:
+        key = str(lalafo_id)
+        return int(key) if key.isdigit() else key
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, lalafo_id) -> Optional[Tuple[int, Optional[int]]]:
+        key = self._key(lalafo_id)
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, lalafo_id, ad_id: int, last_price: Optional[int]) -> None:
+        key = self._key(lalafo_id)
+        self._data[key] = (ad_id, last_price)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def update_from(self, ads) -> None:
+        """Запомнить объявления (Ad/KnownAd) после успешного commit"""
+        for ad in ads:
+            self.put(ad.lalafo_id, ad.id, ad.last_price)
+
+    def discard(self, lalafo_id) -> None:
+        self._data.pop(self._key(lalafo_id), None)
+
+    async def warm(self, session: AsyncSession) -> int:
+        """Загрузить самые свежие объявления (до max_size) одним запросом"""
+        res = await session.execute(
+            select(Ad.lalafo_id, Ad.id, Ad.last_price)
+            .order_by(Ad.updated_at.desc())
+            .limit(self.max_size)
+        )
+        rows = res.all()
+        # Вставляем от старых к свежим: свежие окажутся в «горячем» конце LRU
+        for lalafo_id, ad_id, last_price in reversed(rows):
+            self.put(lalafo_id, ad_id, last_price)
+        loaded = len(rows)
+        self.warmed = True
+        logger.info(f"Индекс известных объявлений прогрет: {loaded} записей, ~{self.memory_bytes() // 1024} КБ")
+        return loaded
+
+    def memory_bytes(self) -> int:
+        """Примерный объём памяти индекса (словарь + ключи + значения)"""
+        total = sys.getsizeof(self._data)
+        for key, value in self._data.items():
+            total += sys.getsizeof(key) + sys.getsizeof(value)
+            total += sys.getsizeof(value[0]) + (sys.getsizeof(value[1]) if value[1] is not None else 0)
+        return total
+
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hit_ratio(), 4),
+            "memory_bytes": self.memory_bytes(),
+        }
+
+
+_index: Optional[KnownAdsIndex] = None
+
+
+def get_known_ads_index() -> KnownAdsIndex:
+    """Индекс процесса (один на воркер)"""
+    global _index
+    if _index is None:
+        _index = KnownAdsIndex()
+    return _index
+
+
+async def warm_known_ads_index(session: AsyncSession) -> KnownAdsIndex:
+    """Прогреть индекс процесса, если это ещё не сделано"""
+    index = get_known_ads_index()
+    if not index.warmed:
+        await index.warm(session)
+    return index
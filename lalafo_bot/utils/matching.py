@@ -0,0 +1,198 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Цвета из COLORS (get_phone_characters) приводим к одному названию,
+# чтобы фильтр «черный» находил и объявления с «black»
+COLOR_ALIASES = {
+    "black": "черный",
+    "white": "белый",
+    "blue": "синий",
+    "red": "красный",
+    "green": "зеленый",
+    "yellow": "желтый",
+    "pink": "розовый",
+    "purple": "фиолетовый",
+    "gray": "серый",
+    "grey": "серый",
+    "чёрный": "черный",
+    "зелёный": "зеленый",
+    "жёлтый": "желтый",
+}
+
+_INT_PATTERN = re.compile(r"\d+")
+
+# Коды категорий: -1 у фильтра — «любой», -2 у объявления — «неизвестен / нет среди фильтров»
+_ANY = -1
+_UNKNOWN = -2
+
+
+def normalize_color(color: Optional[str]) -> Optional[str]:
+    if not color:
+        return None
+    color = color.strip().lower()
+    return COLOR_ALIASES.get(color, color)
+
+
+def normalize_city(city: Optional[str]) -> Optional[str]:
+    if not city:
+        return None
+    return city.strip().lower()
+
+
+def _to_int(value: Any) -> Optional[int]:
+    """128 / "128 GB" / "87 %" → число, иначе None"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    match = _INT_PATTERN.search(str(value))
+    return int(match.group()) if match else None
+
+
+def ad_storage_gb(ad_payload: dict) -> Optional[int]:
+    storage_gb = ad_payload.get("storage_gb")
+    return storage_gb if storage_gb is not None else _to_int(ad_payload.get("storage"))
+
+
+def ad_battery(ad_payload: dict) -> Optional[int]:
+    battery_pct = ad_payload.get("battery_pct")
+    return battery_pct if battery_pct is not None else _to_int(ad_payload.get("battery"))
+
+
+def has_extended_criteria(flt) -> bool:
+    """Есть ли у фильтра критерии кроме модели и цены"""
+    return any(
+        getattr(flt, name, None) is not None
+        for name in ("min_battery", "min_storage_gb", "color", "city", "below_median_pct")
+    )
+
+
+def deal_threshold(median: Optional[float], below_median_pct: int) -> Optional[float]:
+    """Максимальная цена «выгодного» объявления: медиана минус below_median_pct %"""
+    if median is None:
+        return None
+    return median * ((100 - below_median_pct) / 100)
+
+
+def matches_filter(flt, ad_payload: dict, price_stats=None) -> bool:
+    """
+    Подходит ли объявление под фильтр — по одному фильтру за раз.
+    Эталон для FilterMatrix: если фильтр требует атрибут, а в объявлении
+    его не удалось распознать, объявление не подходит. Это же касается
+    below_median_pct без статистики цен модели (price_stats, см. utils/price_stats.py).
+    """
+    price = ad_payload.get("new_price")
+    if flt.max_price is not None and (price is None or price > flt.max_price):
+        return False
+    if flt.min_battery is not None:
+        battery = ad_battery(ad_payload)
+        if battery is None or battery < flt.min_battery:
+            return False
+    if flt.min_storage_gb is not None:
+        storage = ad_storage_gb(ad_payload)
+        if storage is None or storage < flt.min_storage_gb:
+            return False
+    if flt.color is not None and normalize_color(ad_payload.get("color")) != normalize_color(flt.color):
+        return False
+    if flt.city is not None and normalize_city(ad_payload.get("city")) != normalize_city(flt.city):
+        return False
+    below_median_pct = getattr(flt, "below_median_pct", None)
+    if below_median_pct is not None:
+        threshold = deal_threshold(price_stats.ad_median(ad_payload) if price_stats else None, below_median_pct)
+        if price is None or threshold is None or price > threshold:
+            return False
+    return True
+
+
+class FilterMatrix:
+    """
+    Все фильтры группы в виде столбцов NumPy: страница объявлений
+    сверяется со всеми фильтрами одной векторной операцией, результат —
+    булева матрица попаданий [объявление × фильтр].
+
+    Цвет и город кодируются целыми по словарю значений, встречающихся в фильтрах;
+    «без ограничения» — это +inf для цены и -1 для минимумов и категорий.
+    «На X% ниже медианы» — множитель (100 - X) / 100 к медиане объявления, NaN — без условия.
+    """
+
+    def __init__(self, filters: Sequence):
+        self.filters = list(filters)
+        self._colors: Dict[str, int] = {}
+        self._cities: Dict[str, int] = {}
+        n = len(self.filters)
+
+        self.max_price = np.full(n, np.inf)
+        # -1 — без ограничения: нераспознанный атрибут объявления (тоже -1) его проходит
+        self.min_battery = np.full(n, -1, dtype=np.int32)
+        self.min_storage = np.full(n, -1, dtype=np.int32)
+        self.color = np.full(n, _ANY, dtype=np.int32)
+        self.city = np.full(n, _ANY, dtype=np.int32)
+        self.deal_factor = np.full(n, np.nan)
+        for i, flt in enumerate(self.filters):
+            if flt.max_price is not None:
+                self.max_price[i] = flt.max_price
+            if flt.min_battery is not None:
+                self.min_battery[i] = flt.min_battery
+            if flt.min_storage_gb is not None:
+                self.min_storage[i] = flt.min_storage_gb
+            color = normalize_color(flt.color)
+            if color is not None:
+                self.color[i] = self._colors.setdefault(color, len(self._colors))
+            city = normalize_city(flt.city)
+            if city is not None:
+                self.city[i] = self._cities.setdefault(city, len(self._cities))
+            below_median_pct = getattr(flt, "below_median_pct", None)
+            if below_median_pct is not None:
+                self.deal_factor[i] = (100 - below_median_pct) / 100
+        self.unbounded_price = np.isinf(self.max_price)
+        self.no_deal = np.isnan(self.deal_factor)
+        self.has_deal = not self.no_deal.all()
+
+    def _ad_columns(self, ads: Sequence[dict]):
+        n = len(ads)
+        price = np.full(n, np.nan)
+        battery = np.full(n, -1, dtype=np.int32)
+        storage = np.full(n, -1, dtype=np.int32)
+        color = np.full(n, _UNKNOWN, dtype=np.int32)
+        city = np.full(n, _UNKNOWN, dtype=np.int32)
+        for i, ad in enumerate(ads):
+            if ad.get("new_price") is not None:
+                price[i] = ad["new_price"]
+            value = ad_battery(ad)
+            if value is not None:
+                battery[i] = value
+            value = ad_storage_gb(ad)
+            if value is not None:
+                storage[i] = value
+            color[i] = self._colors.get(normalize_color(ad.get("color")), _UNKNOWN)
+            city[i] = self._cities.get(normalize_city(ad.get("city")), _UNKNOWN)
+        return price, battery, storage, color, city
+
+    def match(self, ads: Sequence[dict], price_stats=None) -> np.ndarray:
+        """
+        Булева матрица попаданий формы (len(ads), len(filters)).
+        price_stats (ModelPriceStats) нужен фильтрам с below_median_pct.
+        """
+        if not ads or not self.filters:
+            return np.zeros((len(ads), len(self.filters)), dtype=bool)
+        price, battery, storage, color, city = self._ad_columns(ads)
+        # NaN (цены нет) при сравнении даёт False — такие объявления проходят только фильтры без цены
+        hits = self.unbounded_price[None, :] | (price[:, None] <= self.max_price[None, :])
+        hits &= battery[:, None] >= self.min_battery[None, :]
+        hits &= storage[:, None] >= self.min_storage[None, :]
+        hits &= (self.color[None, :] == _ANY) | (color[:, None] == self.color[None, :])
+        hits &= (self.city[None, :] == _ANY) | (city[:, None] == self.city[None, :])
+        if self.has_deal:
+            # Медиана на объявление (по его памяти) — одна на страницу, не на фильтр
+            median = np.array(
+                [(price_stats.ad_median(ad) if price_stats else None) for ad in ads], dtype=float
+            )
+            hits &= self.no_deal[None, :] | (price[:, None] <= median[:, None] * self.deal_factor[None, :])
+        return hits
+
+    def matched_filters(self, ads: Sequence[dict], price_stats=None) -> List[List]:
+        """Для каждого объявления — список подошедших фильтров"""
+        hits = self.match(ads, price_stats)
+        return [[self.filters[j] for j in np.flatnonzero(row)] for row in hits]
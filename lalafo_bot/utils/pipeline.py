@@ -0,0 +1,91 @@
+import asyncio
+import os
+import time
+import logging
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сколько элементов может ждать между стадиями (backpressure: быстрая стадия ждёт медленную)
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "2"))
+
+_DONE = object()
+
+
+class Stage:
+    """
+    Стадия конвейера: handler(элемент) → результат для следующей стадии
+    (None — дальше ничего не передаём). workers — сколько элементов стадия
+    обрабатывает одновременно; стадия с AsyncSession должна иметь workers=1.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Any]], workers: int = 1):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.processed = 0
+        self.busy = 0.0
+        self.first_done_at: Optional[float] = None
+
+    def stats(self, started: float) -> Dict[str, float]:
+        return {
+            "processed": self.processed,
+            "busy": round(self.busy, 3),
+            "first_done": round(self.first_done_at - started, 3) if self.first_done_at else None,
+        }
+
+
+async def run_pipeline(source: AsyncIterable, stages: List[Stage]) -> Dict[str, Dict[str, float]]:
+    """
+    Прогнать элементы source через стадии по мере поступления.
+
+    Между стадиями — очереди на PIPELINE_QUEUE_SIZE элементов, так что
+    в памяти одновременно лишь несколько страниц, а не весь обход.
+    Ошибка любой стадии останавливает весь конвейер и пробрасывается.
+    Возвращает статистику по стадиям (обработано, время работы,
+    когда стадия закончила первый элемент — для последней это время
+    до первого уведомления).
+    """
+    started = time.monotonic()
+    queues = [asyncio.Queue(maxsize=PIPELINE_QUEUE_SIZE) for _ in stages]
+
+    async def feed():
+        async for item in source:
+            await queues[0].put(item)
+        for _ in range(stages[0].workers):
+            await queues[0].put(_DONE)
+
+    async def work(i: int, stage: Stage, finished: List[int]):
+        inbox = queues[i]
+        outbox = queues[i + 1] if i + 1 < len(stages) else None
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            t = time.monotonic()
+            result = await stage.handler(item)
+            stage.busy += time.monotonic() - t
+            stage.processed += 1
+            if stage.first_done_at is None:
+                stage.first_done_at = time.monotonic()
+            if outbox is not None and result is not None:
+                await outbox.put(result)
+        # Последний закончивший воркер стадии закрывает вход следующей
+        finished[0] += 1
+        if outbox is not None and finished[0] == stage.workers:
+            for _ in range(stages[i + 1].workers):
+                await outbox.put(_DONE)
+
+    tasks = [asyncio.create_task(feed())]
+    for i, stage in enumerate(stages):
+        finished = [0]
+        tasks.extend(asyncio.create_task(work(i, stage, finished)) for _ in range(stage.workers))
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return {stage.name: stage.stats(started) for stage in stages}
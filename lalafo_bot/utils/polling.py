@@ -0,0 +1,57 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+# Границы интервала опроса: горячие модели — раз в несколько минут, «мёртвые» — раз в час
+POLL_MIN_INTERVAL = timedelta(minutes=int(os.getenv("POLL_MIN_MINUTES", "3")))
+POLL_MAX_INTERVAL = timedelta(minutes=int(os.getenv("POLL_MAX_MINUTES", "60")))
+# Сколько совпадений хотим в среднем находить за одну проверку
+POLL_TARGET_HITS = float(os.getenv("POLL_TARGET_HITS", "1"))
+# Вес новой проверки в скользящем среднем hit_rate
+POLL_EWMA_ALPHA = float(os.getenv("POLL_EWMA_ALPHA", "0.3"))
+# На сколько откладываем фильтры, отданные в обход, чтобы их не взяли второй раз
+POLL_LEASE = timedelta(minutes=int(os.getenv("POLL_LEASE_MINUTES", "10")))
+# Не чаще, чем раз в столько минут, сообщаем пользователю, что по фильтру ничего нового
+EMPTY_NOTICE_INTERVAL = timedelta(minutes=int(os.getenv("EMPTY_NOTICE_MINUTES", "15")))
+
+
+def update_hit_rate(
+    old_rate: Optional[float],
+    hits: int,
+    last_checked_at: Optional[datetime],
+    now: datetime,
+) -> float:
+    """
+    Скользящее среднее (EWMA) числа совпадений в час.
+    Первая проверка фильтра (last_checked_at нет) видит весь накопленный
+    хвост ленты, а не частоту — поэтому начинаем с середины диапазона.
+    """
+    if last_checked_at is None:
+        middle = (POLL_MIN_INTERVAL + POLL_MAX_INTERVAL) / 2
+        return POLL_TARGET_HITS / (middle.total_seconds() / 3600)
+    # Не даём очень короткому промежутку раздуть оценку
+    elapsed = max(now - last_checked_at, POLL_MIN_INTERVAL)
+    sample = hits / (elapsed.total_seconds() / 3600)
+    return POLL_EWMA_ALPHA * sample + (1 - POLL_EWMA_ALPHA) * (old_rate or 0.0)
+
+
+def poll_interval(rate_per_hour: float) -> timedelta:
+    """
+    Интервал до следующей проверки: столько, чтобы в среднем набралось
+    POLL_TARGET_HITS совпадений, в пределах [POLL_MIN_INTERVAL, POLL_MAX_INTERVAL].
+    """
+    if rate_per_hour <= 0:
+        return POLL_MAX_INTERVAL
+    interval = timedelta(hours=POLL_TARGET_HITS / rate_per_hour)
+    return min(max(interval, POLL_MIN_INTERVAL), POLL_MAX_INTERVAL)
+
+
+def empty_notice_due(last_checked_at: Optional[datetime], now: Optional[datetime] = None) -> bool:
+    """
+    Слать ли «новых объявлений нет» после проверки фильтра: только если
+    предыдущая была не ближе EMPTY_NOTICE_INTERVAL. Горячие модели опрашиваются
+    раз в несколько минут — иначе пустое уведомление приходило бы на каждую проверку.
+    """
+    if last_checked_at is None:
+        return True
+    return (now or datetime.utcnow()) - last_checked_at >= EMPTY_NOTICE_INTERVAL
@@ -0,0 +1,173 @@
+import os
+import math
+import logging
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Относительная точность квантилей: ответ в пределах ±1% от истинного значения
+PRICE_STATS_ACCURACY = float(os.getenv("PRICE_STATS_ACCURACY", "0.01"))
+# За сколько дней вес наблюдения падает вдвое — рынок «забывает» старые цены
+PRICE_STATS_HALF_LIFE_DAYS = float(os.getenv("PRICE_STATS_HALF_LIFE_DAYS", "14"))
+# Меньше стольких (взвешенных) наблюдений по памяти — берём медиану всей модели
+PRICE_STATS_MIN_COUNT = float(os.getenv("PRICE_STATS_MIN_COUNT", "20"))
+# Сколько дней помнить учтённую цену объявления (price_observations): объявление,
+# провисевшее дольше без изменений, учитывается снова — как свежий срез рынка
+PRICE_STATS_SEEN_DAYS = int(os.getenv("PRICE_STATS_SEEN_DAYS", "30"))
+
+# storage_gb = 0 — вся модель, без разбивки по памяти
+ALL_STORAGE = 0
+
+_GAMMA = (1 + PRICE_STATS_ACCURACY) / (1 - PRICE_STATS_ACCURACY)
+_LOG_GAMMA = math.log(_GAMMA)
+# Корзины с меньшим весом после затухания выбрасываем
+_PRUNE_WEIGHT = 1e-3
+
+
+class PriceSketch:
+    """
+    Потоковый скетч квантилей цены (в духе DDSketch): цена попадает
+    в логарифмическую корзину ceil(log_gamma(price)), хранится только
+    вес корзины. Любой квантиль — с относительной ошибкой PRICE_STATS_ACCURACY,
+    а размер не зависит от числа наблюдений (сотни корзин на весь диапазон цен).
+
+    Веса экспоненциально затухают (PRICE_STATS_HALF_LIFE_DAYS): медиана
+    скользящая, без хранения самих наблюдений.
+    """
+
+    __slots__ = ("counts", "total", "updated_at")
+
+    def __init__(self, counts: Optional[Dict[int, float]] = None, updated_at: Optional[datetime] = None):
+        self.counts: Dict[int, float] = counts or {}
+        self.total = sum(self.counts.values())
+        self.updated_at = updated_at
+
+    def decay(self, now: datetime) -> None:
+        """Состарить веса до момента now"""
+        if self.updated_at is not None and now > self.updated_at and self.counts:
+            days = (now - self.updated_at).total_seconds() / 86400
+            factor = 0.5 ** (days / PRICE_STATS_HALF_LIFE_DAYS)
+            self.counts = {k: w * factor for k, w in self.counts.items() if w * factor >= _PRUNE_WEIGHT}
+            self.total = sum(self.counts.values())
+        if self.updated_at is None or now > self.updated_at:
+            self.updated_at = now
+
+    def add(self, price: float, weight: float = 1.0) -> None:
+        if price is None or price <= 0:
+            return
+        key = math.ceil(math.log(price) / _LOG_GAMMA)
+        self.counts[key] = self.counts.get(key, 0.0) + weight
+        self.total += weight
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Значение q-квантиля (0..1) или None, если наблюдений нет"""
+        if self.total <= 0:
+            return None
+        rank = q * self.total
+        seen = 0.0
+        for key in sorted(self.counts):
+            seen += self.counts[key]
+            if seen >= rank:
+                # Середина корзины (gamma^(k-1), gamma^k] в смысле относительной ошибки
+                return 2 * _GAMMA ** key / (_GAMMA + 1)
+        return 2 * _GAMMA ** max(self.counts) / (_GAMMA + 1)
+
+    def median(self) -> Optional[float]:
+        return self.quantile(0.5)
+
+    def to_bytes(self) -> bytes:
+        """Компактно: номера корзин (int16) и веса (float32) — ~6 байт на корзину"""
+        keys = sorted(self.counts)
+        return array("h", [len(keys)]).tobytes() + array("h", keys).tobytes() + array("f", [self.counts[k] for k in keys]).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes], updated_at: Optional[datetime] = None) -> "PriceSketch":
+        if not data:
+            return cls(updated_at=updated_at)
+        size = array("h", data[:2])[0]
+        keys = array("h", data[2:2 + 2 * size])
+        weights = array("f", data[2 + 2 * size:])
+        return cls(dict(zip(keys, weights)), updated_at=updated_at)
+
+
+class ModelPriceStats:
+    """
+    Скетчи одной модели Lalafo: по всей модели (ALL_STORAGE) и по объёму памяти.
+    Грузится из таблицы price_stats в начале прогона модели и сохраняется
+    в его конце (см. services_for_prices) — между прогонами и воркерами
+    переезжают только эти сотни байт, без агрегации по ads.
+
+    Медианы прогона — по скетчам на его начало: цены прогона копятся
+    в pending и попадают в скетч при сохранении, уже без повторов.
+    """
+
+    def __init__(self, model_param: int, sketches: Optional[Dict[int, PriceSketch]] = None):
+        self.model_param = model_param
+        self.sketches: Dict[int, PriceSketch] = sketches or {}
+        # lalafo_id → (цена, storage_gb): кандидаты в скетч от этого прогона
+        self.pending: Dict[str, Tuple[int, Optional[int]]] = {}
+        self._medians: Dict[int, Optional[float]] = {}
+
+    def observe(self, ads: Iterable) -> int:
+        """
+        Запомнить цены объявлений прогона (pending). Учтёт их save_price_stats —
+        только объявления, увиденные впервые или с другой ценой: иначе долго
+        висящие объявления перевешивали бы рынок. Возвращает число кандидатов.
+        """
+        observed = 0
+        for ad in ads:
+            price = ad.get("new_price")
+            lalafo_id = ad.get("lalafo_id")
+            if price is None or price <= 0 or lalafo_id is None:
+                continue
+            self.pending[str(lalafo_id)] = (int(price), ad.get("storage_gb"))
+            observed += 1
+        return observed
+
+    def add(self, observations: Iterable[Tuple[int, Optional[int]]], now: Optional[datetime] = None) -> int:
+        """Добавить в скетчи цены [(цена, storage_gb)], состарив веса до now"""
+        now = now or datetime.utcnow()
+        observed = 0
+        for price, storage_gb in observations:
+            if not observed:
+                for sketch in self.sketches.values():
+                    sketch.decay(now)
+            self._sketch(ALL_STORAGE, now).add(price)
+            if storage_gb:
+                self._sketch(storage_gb, now).add(price)
+            observed += 1
+        if observed:
+            self._medians.clear()
+        return observed
+
+    def refresh(self, sketches: Dict[int, PriceSketch]) -> None:
+        """Подменить скетчи сохранёнными в БД (после save_price_stats)"""
+        self.sketches.update(sketches)
+        self._medians.clear()
+
+    def _sketch(self, storage_gb: int, now: datetime) -> PriceSketch:
+        sketch = self.sketches.get(storage_gb)
+        if sketch is None:
+            sketch = self.sketches[storage_gb] = PriceSketch(updated_at=now)
+        return sketch
+
+    def median(self, storage_gb: Optional[int] = None) -> Optional[float]:
+        """
+        Медиана цены для объёма памяти; если по нему мало наблюдений
+        (или объём неизвестен) — медиана всей модели, без данных — None.
+        """
+        key = storage_gb or ALL_STORAGE
+        if key not in self._medians:
+            sketch = self.sketches.get(key)
+            if key != ALL_STORAGE and (sketch is None or sketch.total < PRICE_STATS_MIN_COUNT):
+                self._medians[key] = self.median(None)
+            elif sketch is None or sketch.total < PRICE_STATS_MIN_COUNT:
+                self._medians[key] = None
+            else:
+                self._medians[key] = sketch.median()
+        return self._medians[key]
+
+    def ad_median(self, ad) -> Optional[float]:
+        return self.median(ad.get("storage_gb"))
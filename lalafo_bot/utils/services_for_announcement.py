@@ -1,11 +1,18 @@
 from datetime import datetime
-from typing import Optional, Tuple, Literal, Dict, Any
+from typing import Optional, Tuple, Literal, Dict, Any, List, Union
 
-from sqlalchemy import select
+from sqlalchemy import select, and_, or_, func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import IntegrityError, DBAPIError
 
 from database.models import Ad, FilterAd
+from database.session import commit_or_flush
+from utils.known_ads import KnownAd, KnownAdsIndex, get_known_ads_index
+from parser.records import ParsedAd, as_parsed_ad
+from utils.services_for_prices import append_price_history
+import logging
+logger = logging.getLogger(__name__)
 
 
 async def get_ad_by_lalafo_id(session: AsyncSession, lalafo_id: str) -> Optional[Ad]:
@@ -25,6 +32,12 @@ async def create_ad(
     city: Optional[str],
     url: str,
     price: Optional[int],
+    model: Optional[str] = None,
+    storage_gb: Optional[int] = None,
+    battery_pct: Optional[int] = None,
+    color: Optional[str] = None,
+    seller_phone: Optional[str] = None,
+    commit: bool = True,
 ) -> Ad:
     """
     Создать новое объявление.
@@ -34,7 +47,10 @@ async def create_ad(
         title — название объявления.
         city — город или None.
         url — ссылка на объявление.
-        price — текущая цена (может быть None).
+        price — текущая цена (может быть None), она же первая точка истории цен.
+        model, storage_gb, battery_pct, color — характеристики от парсера (или None).
+        seller_phone — телефон продавца (или None).
+        commit — False внутри unit_of_work (только flush).
 
     Возвращает: объект Ad (сохранённый).
     """
@@ -44,12 +60,21 @@ async def create_ad(
         city=city,
         url=url,
         last_price=price,
+        model=model,
+        storage_gb=storage_gb,
+        battery_pct=battery_pct,
+        color=color,
+        seller_phone=seller_phone,
         created_at=datetime.utcnow(),
         updated_at=datetime.utcnow(),
     )
     session.add(ad)
-    await session.commit()
-    await session.refresh(ad)
+    # Нужен ad.id для первой точки истории цен
+    await session.flush()
+    await append_price_history(session, [(ad.id, ad.created_at, price)], commit=False)
+    if commit:
+        await session.commit()
+        await session.refresh(ad)
     return ad
 
 
@@ -58,34 +83,39 @@ async def update_ad_price(
     *,
     ad: Ad,
     new_price: Optional[int],
+    commit: bool = True,
 ) -> Literal["price_drop", "no_change"]:
     """
     Обновить цену объявления.
     
     Если цена уменьшилась — обновляем и возвращаем "price_drop".
     Если изменений нет — возвращаем "no_change".
+    Записанная цена попадает и в историю (ad_prices).
     """
     if new_price is not None and ad.last_price is not None:
         if new_price < ad.last_price:
             ad.last_price = new_price
             ad.updated_at = datetime.utcnow()
-            await session.commit()
+            await append_price_history(session, [(ad.id, ad.updated_at, new_price)], commit=False)
+            await commit_or_flush(session, commit)
             return "price_drop"
     elif new_price is not None and ad.last_price is None:
         ad.last_price = new_price
         ad.updated_at = datetime.utcnow()
-        await session.commit()
+        await append_price_history(session, [(ad.id, ad.updated_at, new_price)], commit=False)
+        await commit_or_flush(session, commit)
     return "no_change"
 
 
 async def add_or_update_ad(
     session: AsyncSession,
-    ad_payload: Dict[str, Any],
+    ad_payload: Union[ParsedAd, Dict[str, Any]],
+    commit: bool = True,
 ) -> Tuple[Literal["new", "price_drop", "seen"], Ad]:
     """
     Добавить новое объявление или обновить существующее.
 
-    ad_payload ожидается в формате:
+    ad_payload — ParsedAd (см. parser.records) или dict в том же формате:
         {
             "lalafo_id": str | int,
             "title": str,
@@ -99,29 +129,191 @@ async def add_or_update_ad(
         - "price_drop" — цена обновлена вниз,
         - "seen"       — объявление уже есть, изменений нет.
     """
-    lalafo_id = str(ad_payload["lalafo_id"])
-    new_price = ad_payload.get("new_price")
+    ad_payload = as_parsed_ad(ad_payload)
+    lalafo_id = str(ad_payload.lalafo_id)
+    new_price = ad_payload.new_price
 
     ad = await get_ad_by_lalafo_id(session, lalafo_id)
     if ad is None:
         ad = await create_ad(
             session,
             lalafo_id=lalafo_id,
-            title=ad_payload.get("title"),
-            city=ad_payload.get("city"),
-            url=ad_payload.get("url"),
+            title=ad_payload.title,
+            city=ad_payload.city,
+            url=ad_payload.url,
             price=new_price,
+            model=ad_payload.model or None,
+            storage_gb=ad_payload.storage_gb,
+            battery_pct=ad_payload.battery_pct,
+            color=ad_payload.color,
+            seller_phone=ad_payload.author_number,
+            commit=commit,
         )
         return "new", ad
 
-    status = await update_ad_price(session, ad=ad, new_price=new_price)
+    status = await update_ad_price(session, ad=ad, new_price=new_price, commit=commit)
     if status == "price_drop":
         return "price_drop", ad
 
     return "seen", ad
 
 
-async def delete_ad(session: AsyncSession, ad_id: int) -> bool:
+# Распознанные характеристики объявления (колонки ads, см. миграцию c91f4d7a2b58)
+AD_ATTRIBUTE_COLUMNS = ("model", "storage_gb", "battery_pct", "color", "seller_phone")
+
+
+def _price_should_update(old_price: Optional[int], new_price: Optional[int]) -> bool:
+    """Те же правила, что в update_ad_price: цену пишем, если она упала или её не было"""
+    return new_price is not None and (old_price is None or new_price < old_price)
+
+
+async def _upsert_ad_rows(session: AsyncSession, rows: List[Dict[str, Any]]) -> Dict[str, Ad]:
+    """INSERT ... ON CONFLICT (lalafo_id) DO UPDATE ... RETURNING для готовых строк"""
+    stmt = pg_insert(Ad).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Ad.lalafo_id],
+        set_={
+            "last_price": stmt.excluded.last_price,
+            "updated_at": stmt.excluded.updated_at,
+            # Характеристики дописываем, только если их ещё нет (строки до миграции)
+            **{
+                name: func.coalesce(getattr(Ad, name), stmt.excluded[name])
+                for name in AD_ATTRIBUTE_COLUMNS
+            },
+        },
+        # Как в update_ad_price: не переписываем строку, если цена не упала
+        where=and_(
+            stmt.excluded.last_price.isnot(None),
+            or_(Ad.last_price.is_(None), stmt.excluded.last_price < Ad.last_price),
+        ),
+    ).returning(Ad)
+    res = await session.execute(stmt, execution_options={"populate_existing": True})
+    return {ad.lalafo_id: ad for ad in res.scalars()}
+
+
+async def bulk_upsert_ads(
+    session: AsyncSession,
+    ad_payloads: List[Union[ParsedAd, Dict[str, Any]]],
+    commit: bool = True,
+    index: Optional[KnownAdsIndex] = None,
+) -> List[Tuple[Literal["new", "price_drop", "seen"], Union[Ad, KnownAd]]]:
+    """
+    Пакетный вариант add_or_update_ad для целой страницы объявлений.
+
+    Вместо SELECT + INSERT/UPDATE + commit на каждое объявление:
+    - один SELECT существующих объявлений страницы (старые цены),
+    - один INSERT ... ON CONFLICT (lalafo_id) DO UPDATE ... RETURNING
+      только для новых объявлений и объявлений с упавшей ценой,
+    - один commit (или только flush при commit=False внутри unit_of_work).
+
+    Запись идёт под SAVEPOINT: если пачка падает, объявления пишутся
+    по одному, и битые пропускаются без потери остальных.
+
+    С index (KnownAdsIndex) объявления, известные индексу и без падения
+    цены, вообще не идут в БД: для них возвращается KnownAd со статусом "seen".
+    Сам индекс здесь не меняется — вызывающий обновляет его после commit
+    (index.update_from), чтобы откат транзакции не оставил в нём чужих id.
+
+    Дубликаты lalafo_id внутри пачки схлопываются (побеждает последний).
+    Возвращает [(статус, Ad)] по уникальным объявлениям в порядке входа,
+    статусы те же, что у add_or_update_ad: "new" / "price_drop" / "seen".
+    """
+    if not ad_payloads:
+        return []
+
+    now = datetime.utcnow()
+    rows: Dict[str, Dict[str, Any]] = {}
+    for payload in map(as_parsed_ad, ad_payloads):
+        lalafo_id = str(payload.lalafo_id)
+        rows[lalafo_id] = {
+            "lalafo_id": lalafo_id,
+            "title": payload.title,
+            "city": payload.city,
+            "url": payload.url,
+            "last_price": payload.new_price,
+            "model": payload.model or None,
+            "storage_gb": payload.storage_gb,
+            "battery_pct": payload.battery_pct,
+            "color": payload.color,
+            "seller_phone": payload.author_number,
+            "created_at": now,
+            "updated_at": now,
+        }
+
+    order = list(rows)
+    known: Dict[str, KnownAd] = {}
+    if index is not None:
+        for lalafo_id, row in list(rows.items()):
+            entry = index.get(lalafo_id)
+            if entry is not None and not _price_should_update(entry[1], row["last_price"]):
+                ad_id, last_price = entry
+                known[lalafo_id] = KnownAd(
+                    ad_id, lalafo_id, row["title"], row["city"], row["url"], last_price
+                )
+                del rows[lalafo_id]
+
+    existing: Dict[str, Ad] = {}
+    if rows:
+        res = await session.execute(select(Ad).where(Ad.lalafo_id.in_(list(rows))))
+        existing = {ad.lalafo_id: ad for ad in res.scalars()}
+    old_prices = {lalafo_id: ad.last_price for lalafo_id, ad in existing.items()}
+
+    to_write = [
+        row for lalafo_id, row in rows.items()
+        if lalafo_id not in existing or _price_should_update(old_prices[lalafo_id], row["last_price"])
+    ]
+
+    written: Dict[str, Ad] = {}
+    if to_write:
+        try:
+            async with session.begin_nested():
+                written = await _upsert_ad_rows(session, to_write)
+        except DBAPIError:
+            # Одна битая строка не должна терять всю пачку: пишем по одной под SAVEPOINT
+            logger.exception(f"[DB] Пачка из {len(to_write)} объявлений не записалась, пишем по одному")
+            for row in to_write:
+                try:
+                    async with session.begin_nested():
+                        written.update(await _upsert_ad_rows(session, [row]))
+                except DBAPIError:
+                    logger.exception(f"[DB] Объявление {row['lalafo_id']} пропущено")
+
+    # Гонка с другим воркером: строка появилась между SELECT и INSERT,
+    # и ON CONFLICT её не обновил — дочитываем её отдельно
+    missing = [lalafo_id for lalafo_id in rows if lalafo_id not in written and lalafo_id not in existing]
+    if missing:
+        res = await session.execute(select(Ad).where(Ad.lalafo_id.in_(missing)))
+        existing.update({ad.lalafo_id: ad for ad in res.scalars()})
+
+    # RETURNING отдаёт только реально записанные строки — это новые объявления
+    # и упавшие цены: вся история страницы уходит одним INSERT
+    await append_price_history(
+        session,
+        [(ad.id, now, rows[lalafo_id]["last_price"]) for lalafo_id, ad in written.items()],
+        commit=False,
+    )
+    await commit_or_flush(session, commit)
+
+    results: List[Tuple[Literal["new", "price_drop", "seen"], Union[Ad, KnownAd]]] = []
+    for lalafo_id in order:
+        if lalafo_id in known:
+            results.append(("seen", known[lalafo_id]))
+            continue
+        row = rows[lalafo_id]
+        ad = written.get(lalafo_id) or existing.get(lalafo_id)
+        if ad is None:
+            continue  # строка пропущена из-за ошибки записи
+        if lalafo_id not in old_prices:
+            status = "new" if lalafo_id in written else "seen"
+        else:
+            old_price, new_price = old_prices[lalafo_id], row["last_price"]
+            dropped = old_price is not None and new_price is not None and new_price < old_price
+            status = "price_drop" if dropped else "seen"
+        results.append((status, ad))
+    return results
+
+
+async def delete_ad(session: AsyncSession, ad_id: int, commit: bool = True) -> bool:
     """
     Удалить объявление по ID. Возвращает True, если удалено.
     """
@@ -129,7 +321,8 @@ async def delete_ad(session: AsyncSession, ad_id: int) -> bool:
     if not ad:
         return False
 
+    get_known_ads_index().discard(ad.lalafo_id)
     await session.delete(ad)
-    await session.commit()
+    await commit_or_flush(session, commit)
     return True
 
@@ -0,0 +1,74 @@
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import CrawlWatermark
+from database.session import commit_or_flush
+import logging
+logger = logging.getLogger(__name__)
+
+# Как часто инкрементальный режим дополнительно проходит глубокие страницы (last_page)
+DEEP_SWEEP_INTERVAL = timedelta(minutes=int(os.getenv("DEEP_SWEEP_MINUTES", "60")))
+
+
+async def get_watermark(session: AsyncSession, model_param: int) -> Optional[CrawlWatermark]:
+    """
+    Водяной знак модели: самый свежий виденный lalafo_id и время глубокого прохода.
+    """
+    return await session.get(CrawlWatermark, model_param)
+
+
+def deep_sweep_due(watermark: Optional[CrawlWatermark], now: Optional[datetime] = None) -> bool:
+    """
+    Пора ли сделать глубокий проход по last_page (ловит падения цен
+    у старых объявлений, до которых инкрементальный обход не доходит).
+    """
+    if watermark is None or watermark.last_deep_sweep_at is None:
+        return True
+    now = now or datetime.utcnow()
+    return now - watermark.last_deep_sweep_at >= DEEP_SWEEP_INTERVAL
+
+
+async def save_watermark(
+    session: AsyncSession,
+    model_param: int,
+    *,
+    newest_lalafo_id: Optional[int],
+    deep_swept: bool = False,
+    commit: bool = True,
+) -> None:
+    """
+    Сохранить водяной знак модели одним INSERT ... ON CONFLICT DO UPDATE.
+    newest_lalafo_id только растёт; время глубокого прохода пишется при deep_swept=True.
+    """
+    now = datetime.utcnow()
+    values = {
+        "model_param": model_param,
+        "newest_lalafo_id": newest_lalafo_id,
+        "updated_at": now,
+    }
+    if deep_swept:
+        values["last_deep_sweep_at"] = now
+
+    stmt = pg_insert(CrawlWatermark).values(**values)
+    update_values = {
+        "newest_lalafo_id": CrawlWatermark.newest_lalafo_id,
+        "updated_at": stmt.excluded.updated_at,
+    }
+    if newest_lalafo_id is not None:
+        update_values["newest_lalafo_id"] = func.greatest(
+            func.coalesce(CrawlWatermark.newest_lalafo_id, 0), stmt.excluded.newest_lalafo_id
+        )
+    if deep_swept:
+        update_values["last_deep_sweep_at"] = stmt.excluded.last_deep_sweep_at
+
+    await session.execute(
+        stmt.on_conflict_do_update(index_elements=[CrawlWatermark.model_param], set_=update_values)
+    )
+    await commit_or_flush(session, commit)
+
+    logger.info(f"[DB] Модель {model_param}: watermark → {newest_lalafo_id}, deep_swept={deep_swept}")
@@ -1,11 +1,15 @@
 from datetime import datetime
-from typing import Optional, List, Tuple, Dict, Any, Literal
+from typing import Optional, List, Tuple, Dict, Any, Literal, Union
 
-from sqlalchemy import select
+from sqlalchemy import select, update, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from database.models import Filter, Ad, FilterAd
+from database.session import commit_or_flush
 from .services_for_announcement import add_or_update_ad
+from .polling import POLL_LEASE, update_hit_rate, poll_interval
+from parser.records import ParsedAd
 import logging
 logger = logging.getLogger(__name__)
 
@@ -17,14 +21,26 @@ async def create_filter(
     user_id: int,
     model: str,
     max_price: Optional[int] = None,
+    min_battery: Optional[int] = None,
+    min_storage_gb: Optional[int] = None,
+    color: Optional[str] = None,
+    city: Optional[str] = None,
+    below_median_pct: Optional[int] = None,
 ) -> Filter:
     """
     Создать новый фильтр для пользователя.
+    Необязательные критерии (батарея, память, цвет, город, «на X% ниже
+    медианы модели») проверяются при раздаче объявлений (utils/matching.py).
     """
     flt = Filter(
         user_id=user_id,
         model=model,
         max_price=max_price,
+        min_battery=min_battery,
+        min_storage_gb=min_storage_gb,
+        color=color,
+        city=city,
+        below_median_pct=below_median_pct,
         created_at=datetime.utcnow(),
     )
     session.add(flt)
@@ -63,21 +79,49 @@ async def delete_filter(session: AsyncSession, filter_id: int) -> bool:
     return True
 
 
-async def update_last_page(session: AsyncSession, filter_id: int, page: int) -> None:
+async def update_last_page(
+    session: AsyncSession,
+    filter_id: int,
+    page: int,
+    commit: bool = True,
+) -> None:
     """
     Обновить last_page у фильтра и залогировать изменение.
+    Один UPDATE без предварительного get и последующего refresh.
     """
-    flt = await session.get(Filter, filter_id)
-    if not flt:
+    res = await session.execute(
+        update(Filter)
+        .where(Filter.id == filter_id)
+        .values(last_page=page)
+        .returning(Filter.id)
+    )
+    if res.scalar_one_or_none() is None:
         logger.warning(f"[DB] Фильтр {filter_id} не найден при обновлении last_page")
         return
+    await commit_or_flush(session, commit)
 
-    old_page = flt.last_page
-    flt.last_page = page
-    await session.commit()
-    await session.refresh(flt)
+    logger.info(f"[DB] Фильтр {filter_id}: last_page → {page}")
+
+
+async def update_last_pages(
+    session: AsyncSession,
+    filter_ids: List[int],
+    page: int,
+    commit: bool = True,
+) -> None:
+    """
+    Обновить last_page сразу у группы фильтров одним UPDATE.
+    """
+    if not filter_ids:
+        return
+    await session.execute(
+        update(Filter)
+        .where(Filter.id.in_(filter_ids))
+        .values(last_page=page)
+    )
+    await commit_or_flush(session, commit)
 
-    logger.info(f"[DB] Фильтр {filter_id}: last_page {old_page} → {flt.last_page}")
+    logger.info(f"[DB] Фильтры {filter_ids}: last_page → {page}")
 
 
 async def get_all_filters(session: AsyncSession) -> List[Filter]:
@@ -89,12 +133,93 @@ async def get_all_filters(session: AsyncSession) -> List[Filter]:
     return res.scalars().all()
 
 
+async def get_filters_by_ids(session: AsyncSession, filter_ids: List[int]) -> List[Filter]:
+    """
+    Получить фильтры по списку ID (подзадача обхода одной модели).
+    Удалённые к этому моменту фильтры просто не вернутся.
+    """
+    if not filter_ids:
+        return []
+    res = await session.execute(select(Filter).where(Filter.id.in_(filter_ids)))
+    return res.scalars().all()
+
+
+
+async def get_due_filters(session: AsyncSession, now: Optional[datetime] = None) -> List[Filter]:
+    """
+    Фильтры, которые пора проверять (вместо get_all_filters в планировщике).
+
+    Модель обходится целиком, поэтому возвращаются все фильтры моделей,
+    у которых хотя бы один фильтр «созрел» (next_check_at <= now или ещё не задан).
+    Поиск созревших идёт по индексу ix_filters_next_check_at.
+    """
+    now = now or datetime.utcnow()
+    due_models = (
+        select(Filter.model)
+        .where(or_(Filter.next_check_at.is_(None), Filter.next_check_at <= now))
+        .distinct()
+    )
+    res = await session.execute(select(Filter).where(Filter.model.in_(due_models)))
+    return res.scalars().all()
+
+
+async def postpone_filters(
+    session: AsyncSession,
+    filter_ids: List[int],
+    now: Optional[datetime] = None,
+    commit: bool = True,
+) -> None:
+    """
+    Отложить фильтры на POLL_LEASE: их уже отдали в обход, и следующий запуск
+    планировщика не должен взять их второй раз. Настоящее next_check_at
+    выставит update_filter_schedules по итогам обхода.
+    """
+    if not filter_ids:
+        return
+    now = now or datetime.utcnow()
+    await session.execute(
+        update(Filter)
+        .where(Filter.id.in_(filter_ids))
+        .values(next_check_at=now + POLL_LEASE)
+    )
+    await commit_or_flush(session, commit)
+
+
+async def update_filter_schedules(
+    session: AsyncSession,
+    filters: List[Filter],
+    hits: Dict[int, int],
+    now: Optional[datetime] = None,
+    commit: bool = True,
+) -> datetime:
+    """
+    Пересчитать hit_rate фильтров модели по итогам обхода и назначить next_check_at.
+
+    Интервал общий для модели (она обходится одним запросом) и считается
+    по суммарной частоте совпадений всех её фильтров. Запись — одним
+    пакетным UPDATE по первичному ключу. Возвращает время следующей проверки.
+    """
+    now = now or datetime.utcnow()
+    rates = {
+        flt.id: update_hit_rate(flt.hit_rate, hits.get(flt.id, 0), flt.last_checked_at, now)
+        for flt in filters
+    }
+    next_check_at = now + poll_interval(sum(rates.values()))
+    if rates:
+        await session.execute(update(Filter), [
+            {"id": filter_id, "hit_rate": rate, "last_checked_at": now, "next_check_at": next_check_at}
+            for filter_id, rate in rates.items()
+        ])
+        await commit_or_flush(session, commit)
+    return next_check_at
+
 
 async def add_ad_to_filter(
     session: AsyncSession,
     *,
     filter_id: int,
-    ad_payload: Dict[str, Any],
+    ad_payload: Union[ParsedAd, Dict[str, Any]],
+    commit: bool = True,
 ) -> Tuple[Literal["new", "price_drop", "seen"], Ad]:
     """
     Добавить объявление к фильтру:
@@ -106,7 +231,7 @@ async def add_ad_to_filter(
         - "price_drop" — цена уменьшилась,
         - "seen"       — уже есть, изменений нет.
     """
-    status, ad = await add_or_update_ad(session, ad_payload)
+    status, ad = await add_or_update_ad(session, ad_payload, commit=commit)
 
     res = await session.execute(
         select(FilterAd).where(
@@ -124,18 +249,92 @@ async def add_ad_to_filter(
             created_at=datetime.utcnow(),
         )
         session.add(f_ad)
-        await session.commit()
+        await commit_or_flush(session, commit)
         return status, ad
     else:
         if ad.last_price is not None and f_ad.seen_price is not None:
             if ad.last_price < f_ad.seen_price:
                 f_ad.seen_price = ad.last_price
-                await session.commit()
+                await commit_or_flush(session, commit)
                 return "price_drop", ad
 
     return status, ad
 
 
+async def link_ads_to_filter(
+    session: AsyncSession,
+    *,
+    filter_id: int,
+    ads: List[Ad],
+    commit: bool = True,
+) -> List[Tuple[Literal["new", "price_drop", "seen"], Ad]]:
+    """
+    Привязать сохранённые объявления к фильтру (страница/группа за раз).
+    Статус считается относительно фильтра (а не всей БД), поэтому
+    одно объявление из общего обхода модели уведомляет каждый фильтр:
+    "new" — впервые привязано, "price_drop" — цена ниже seen_price, "seen" — без изменений.
+    Запросы:
+    - один SELECT существующих связей фильтра с этими объявлениями,
+    - новые связи и падения seen_price считаются в Python,
+    - один INSERT ... ON CONFLICT DO NOTHING (страхует uq_filter_ad)
+      и один пакетный UPDATE seen_price, всё в одной транзакции.
+
+    Возвращает [(статус, Ad)] в порядке входа (дубликаты ad.id схлопываются).
+    """
+    unique_ads: Dict[int, Ad] = {}
+    for ad in ads:
+        unique_ads.setdefault(ad.id, ad)
+    if not unique_ads:
+        return []
+
+    res = await session.execute(
+        select(FilterAd.id, FilterAd.ad_id, FilterAd.seen_price).where(
+            FilterAd.filter_id == filter_id,
+            FilterAd.ad_id.in_(list(unique_ads))
+        )
+    )
+    links = {row.ad_id: row for row in res}
+
+    now = datetime.utcnow()
+    new_links = []
+    price_drops = []
+    statuses: Dict[int, str] = {}
+    for ad_id, ad in unique_ads.items():
+        link = links.get(ad_id)
+        if link is None:
+            new_links.append({
+                "filter_id": filter_id,
+                "ad_id": ad_id,
+                "seen_price": ad.last_price,
+                "created_at": now,
+            })
+        elif ad.last_price is not None and link.seen_price is not None and ad.last_price < link.seen_price:
+            price_drops.append({"id": link.id, "seen_price": ad.last_price})
+            statuses[ad_id] = "price_drop"
+        else:
+            statuses[ad_id] = "seen"
+
+    if new_links:
+        stmt = (
+            pg_insert(FilterAd)
+            .values(new_links)
+            .on_conflict_do_nothing(constraint="uq_filter_ad")
+            .returning(FilterAd.ad_id)
+        )
+        inserted = set((await session.execute(stmt)).scalars())
+        for link in new_links:
+            # Не вставилось — связь успел создать параллельный прогон
+            statuses[link["ad_id"]] = "new" if link["ad_id"] in inserted else "seen"
+
+    if price_drops:
+        await session.execute(update(FilterAd), price_drops)
+
+    if new_links or price_drops:
+        await commit_or_flush(session, commit)
+
+    return [(statuses[ad_id], ad) for ad_id, ad in unique_ads.items()]
+
+
 async def get_ads_for_filter(session: AsyncSession, filter_id: int) -> List[Ad]:
     """
     Получить все объявления, связанные с фильтром.
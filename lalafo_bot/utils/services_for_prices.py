@@ -0,0 +1,231 @@
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import Ad, AdPrice, PriceObservation, PriceStat
+from database.session import commit_or_flush
+from utils.price_stats import ALL_STORAGE, PRICE_STATS_SEEN_DAYS, ModelPriceStats, PriceSketch
+import logging
+logger = logging.getLogger(__name__)
+
+# Сколько дней храним каждое изменение цены; старше — одна точка на объявление в день
+PRICE_HISTORY_RAW_DAYS = int(os.getenv("PRICE_HISTORY_RAW_DAYS", "30"))
+# Сколько дней история хранится вообще
+PRICE_HISTORY_RETENTION_DAYS = int(os.getenv("PRICE_HISTORY_RETENTION_DAYS", "365"))
+# Сколько дней за границей RAW_DAYS прореживаем за запуск (с запасом на пропущенные запуски)
+PRICE_HISTORY_LOOKBACK_DAYS = int(os.getenv("PRICE_HISTORY_LOOKBACK_DAYS", "7"))
+# Строк на один DELETE: короткие транзакции вместо одной на миллионы строк
+PRICE_HISTORY_DELETE_BATCH = int(os.getenv("PRICE_HISTORY_DELETE_BATCH", "10000"))
+
+
+async def append_price_history(
+    session: AsyncSession,
+    observations: List[Tuple[int, datetime, int]],
+    commit: bool = True,
+) -> int:
+    """
+    Дописать точки истории [(ad_id, observed_at, price)] одним INSERT.
+    Повтор той же точки (гонка воркеров) молча пропускается.
+    """
+    rows = [
+        {"ad_id": ad_id, "observed_at": observed_at, "price": price}
+        for ad_id, observed_at, price in observations
+        if price is not None
+    ]
+    if not rows:
+        return 0
+    await session.execute(pg_insert(AdPrice).values(rows).on_conflict_do_nothing())
+    await commit_or_flush(session, commit)
+    return len(rows)
+
+
+async def get_ad_price_history(
+    session: AsyncSession,
+    ad_id: int,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[AdPrice]:
+    """История цен объявления за период (по первичному ключу ad_id, observed_at)"""
+    stmt = select(AdPrice).where(AdPrice.ad_id == ad_id)
+    if since is not None:
+        stmt = stmt.where(AdPrice.observed_at >= since)
+    if until is not None:
+        stmt = stmt.where(AdPrice.observed_at < until)
+    res = await session.execute(stmt.order_by(AdPrice.observed_at))
+    return list(res.scalars())
+
+
+async def get_model_price_history(
+    session: AsyncSession,
+    model: str,
+    since: datetime,
+    until: Optional[datetime] = None,
+    storage_gb: Optional[int] = None,
+) -> List[Tuple[int, datetime, int]]:
+    """
+    Изменения цен всех объявлений модели за период: [(ad_id, observed_at, price)].
+    Объявления модели берутся по индексам ads (model, ...), история каждого —
+    диапазоном по первичному ключу ad_prices, без полного прохода по таблице.
+    """
+    stmt = (
+        select(AdPrice.ad_id, AdPrice.observed_at, AdPrice.price)
+        .join(Ad, Ad.id == AdPrice.ad_id)
+        .where(Ad.model == model, AdPrice.observed_at >= since)
+    )
+    if until is not None:
+        stmt = stmt.where(AdPrice.observed_at < until)
+    if storage_gb is not None:
+        stmt = stmt.where(Ad.storage_gb == storage_gb)
+    res = await session.execute(stmt.order_by(AdPrice.observed_at))
+    return [tuple(row) for row in res.all()]
+
+
+async def _delete_in_batches(session: AsyncSession, keys_stmt) -> int:
+    """Удалять строки, чьи (ad_id, observed_at) выбирает keys_stmt, пачками с commit на каждую"""
+    deleted = 0
+    while True:
+        keys = (await session.execute(keys_stmt.limit(PRICE_HISTORY_DELETE_BATCH))).all()
+        if not keys:
+            return deleted
+        await session.execute(
+            delete(AdPrice).where(tuple_(AdPrice.ad_id, AdPrice.observed_at).in_([tuple(k) for k in keys]))
+        )
+        await session.commit()
+        deleted += len(keys)
+        if len(keys) < PRICE_HISTORY_DELETE_BATCH:
+            return deleted
+
+
+async def compact_price_history(session: AsyncSession, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Обслуживание ad_prices (раз в сутки):
+    - старше PRICE_HISTORY_RETENTION_DAYS — удаляем;
+    - старше PRICE_HISTORY_RAW_DAYS — оставляем последнюю точку объявления за день
+      (цена в ads только падает, так что это и минимум дня);
+    - заодно price_observations старше PRICE_STATS_SEEN_DAYS (см. save_price_stats).
+
+    Прореживается только полоса последних PRICE_HISTORY_LOOKBACK_DAYS дней
+    за границей RAW_DAYS — уже прореженное не перечитывается, а выборка
+    по observed_at идёт через BRIN. Удаление — пачками по PRICE_HISTORY_DELETE_BATCH.
+    """
+    now = now or datetime.utcnow()
+    retention_cutoff = now - timedelta(days=PRICE_HISTORY_RETENTION_DAYS)
+    # По полуночи: прореживаемые дни целиком старше границы
+    raw_cutoff = (now - timedelta(days=PRICE_HISTORY_RAW_DAYS)).replace(hour=0, minute=0, second=0, microsecond=0)
+    band_start = max(retention_cutoff, raw_cutoff - timedelta(days=PRICE_HISTORY_LOOKBACK_DAYS))
+
+    expired = await _delete_in_batches(
+        session,
+        select(AdPrice.ad_id, AdPrice.observed_at).where(AdPrice.observed_at < retention_cutoff),
+    )
+
+    day = func.date_trunc("day", AdPrice.observed_at)
+    ranked = (
+        select(
+            AdPrice.ad_id,
+            AdPrice.observed_at,
+            func.row_number().over(
+                partition_by=(AdPrice.ad_id, day), order_by=AdPrice.observed_at.desc()
+            ).label("rn"),
+        )
+        .where(AdPrice.observed_at >= band_start, AdPrice.observed_at < raw_cutoff)
+        .subquery()
+    )
+    downsampled = await _delete_in_batches(
+        session,
+        select(ranked.c.ad_id, ranked.c.observed_at).where(ranked.c.rn > 1),
+    )
+
+    observations = await session.execute(
+        delete(PriceObservation).where(
+            PriceObservation.observed_at < now - timedelta(days=PRICE_STATS_SEEN_DAYS)
+        )
+    )
+    await session.commit()
+
+    result = {"expired": expired, "downsampled": downsampled, "observations_expired": observations.rowcount}
+    logger.info(f"[DB] История цен: {result}")
+    return result
+
+
+async def load_price_stats(session: AsyncSession, model_param: int) -> ModelPriceStats:
+    """Скетчи цен модели из price_stats (по строке на объём памяти)"""
+    res = await session.execute(select(PriceStat).where(PriceStat.model_param == model_param))
+    return ModelPriceStats(model_param, {
+        row.storage_gb: PriceSketch.from_bytes(row.sketch, updated_at=row.updated_at)
+        for row in res.scalars()
+    })
+
+
+async def save_price_stats(
+    session: AsyncSession,
+    stats: ModelPriceStats,
+    now: Optional[datetime] = None,
+    commit: bool = True,
+) -> int:
+    """
+    Учесть цены прогона (stats.pending) в price_stats. Возвращает число учтённых объявлений.
+
+    1. price_observations: INSERT ... ON CONFLICT DO UPDATE WHERE цена другая
+       RETURNING — возвращаются только объявления, увиденные впервые или
+       с новой ценой. Повторы отсекаются одинаково во всех процессах и после
+       перезапуска воркеров.
+    2. Строки price_stats модели читаются под FOR UPDATE, новые цены
+       добавляются к скетчам из БД, а не к снимку начала прогона. Параллельные
+       прогоны одной модели ждут друг друга на блокировке, а не затирают.
+
+    Строки в обоих шагах идут в порядке ключа — без взаимных блокировок.
+    """
+    pending, stats.pending = stats.pending, {}
+    if not pending:
+        return 0
+    now = now or datetime.utcnow()
+
+    stmt = pg_insert(PriceObservation).values([
+        {"model_param": stats.model_param, "lalafo_id": lalafo_id, "price": price, "observed_at": now}
+        for lalafo_id, (price, _) in sorted(pending.items())
+    ])
+    res = await session.execute(stmt.on_conflict_do_update(
+        index_elements=[PriceObservation.model_param, PriceObservation.lalafo_id],
+        set_={"price": stmt.excluded.price, "observed_at": stmt.excluded.observed_at},
+        where=PriceObservation.price != stmt.excluded.price,
+    ).returning(PriceObservation.lalafo_id))
+    observations = [pending[lalafo_id] for lalafo_id in res.scalars()]
+    if not observations:
+        await commit_or_flush(session, commit)
+        return 0
+
+    keys = sorted({ALL_STORAGE} | {storage_gb for _, storage_gb in observations if storage_gb})
+    # Недостающие строки создаём пустыми, чтобы дальше все шли через FOR UPDATE
+    await session.execute(pg_insert(PriceStat).values([
+        {"model_param": stats.model_param, "storage_gb": key, "count": 0.0, "sketch": b"", "updated_at": now}
+        for key in keys
+    ]).on_conflict_do_nothing())
+    res = await session.execute(
+        select(PriceStat)
+        .where(PriceStat.model_param == stats.model_param, PriceStat.storage_gb.in_(keys))
+        .order_by(PriceStat.storage_gb)
+        .with_for_update()
+        .execution_options(populate_existing=True)
+    )
+    rows = {row.storage_gb: row for row in res.scalars()}
+    merged = ModelPriceStats(stats.model_param, {
+        key: PriceSketch.from_bytes(row.sketch, updated_at=row.updated_at) for key, row in rows.items()
+    })
+    merged.add(observations, now=now)
+    for key, row in rows.items():
+        sketch = merged.sketches[key]
+        median = sketch.median()
+        row.count = sketch.total
+        row.median = round(median) if median is not None else None
+        row.sketch = sketch.to_bytes()
+        row.updated_at = sketch.updated_at
+    await commit_or_flush(session, commit)
+
+    stats.refresh(merged.sketches)
+    logger.debug(f"[DB] Цены модели {stats.model_param}: учтено {len(observations)} из {len(pending)}")
+    return len(observations)
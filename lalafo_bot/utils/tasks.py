@@ -1,55 +1,192 @@
 import os
-import asyncio
+import time
 import logging
-from aiogram import Bot
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from typing import Any, Dict, List
+
+from celery import chord, group
 
 from utils.celery_app import celery_app
-from utils.services_for_filters import get_all_filters
-from utils.check_ads import process_single_filter
+from utils.worker_runtime import get_runtime
+from utils.services_for_filters import get_due_filters, get_filters_by_ids, postpone_filters
+from utils.delivery import DeliveryQueue
+from utils.digest import DigestCollector
+from utils.services_for_prices import compact_price_history
+from utils.check_ads import (
+    flush_digest, process_single_filter, process_filters_grouped, process_model_group,
+    group_filters_by_model, merge_run_summaries, new_run_summary,
+)
 
 logger = logging.getLogger(__name__)
-BOT_TOKEN = os.getenv("BOT_TOKEN")
-DATABASE_URL = os.getenv("DATABASE_URL")
-
-
-async def _run_all_filters_once(*, pages_per_run: int = 3, send_empty: bool = True):
-    engine = create_async_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
-    SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+# Инкрементальный обход по watermark (с периодическим глубоким проходом по last_page)
+INCREMENTAL_CRAWL = os.getenv("INCREMENTAL_CRAWL", "1") == "1"
+# Обход раздаётся воркерам подзадачами по моделям (0 — весь цикл в одной таске)
+CRAWL_FANOUT = os.getenv("CRAWL_FANOUT", "1") == "1"
+# Потоковый обход (страница → разбор → запись → уведомления); в инкрементальном
+# режиме через конвейер идёт глубокий проход по last_page. Дайджест в нём постраничный
+STREAMING_PIPELINE = os.getenv("STREAMING_PIPELINE", "1") == "1"
 
-    bot = Bot(token=BOT_TOKEN)
 
-    try:
-        async with SessionLocal() as session:
-            filters = await get_all_filters(session)
-            logger.info(f"Начата обработка всех фильтров (всего: {len(filters)})")
+async def _run_all_filters_once(
+    *,
+    pages_per_run: int = 3,
+    send_empty: bool = True,
+    group_by_model: bool = True,
+    incremental: bool = INCREMENTAL_CRAWL,
+):
+    # engine, бот и HTTP-клиент живут весь процесс воркера (см. worker_runtime)
+    async with get_runtime().task_context() as ctx:
+        filters = await get_due_filters(ctx.session)
+        await postpone_filters(ctx.session, [flt.id for flt in filters])
+        logger.info(f"Начата обработка фильтров, которые пора проверить (всего: {len(filters)})")
 
+        if group_by_model:
+            # Один обход на модель, объявления раздаются фильтрам в памяти
+            summary = await process_filters_grouped(
+                ctx.session, ctx.bot, filters,
+                pages_per_run=pages_per_run,
+                send_empty=send_empty,
+                incremental=incremental,
+                delivery=ctx.delivery,
+                digest=ctx.digest,
+                streaming=STREAMING_PIPELINE,
+            )
+            logger.info(f"Сводка цикла: {summary}")
+        else:
             for flt in filters:
                 logger.debug(f"Обработка фильтра ID={flt.id}")
                 await process_single_filter(
-                    session, bot, flt,
+                    ctx.session, ctx.bot, flt,
                     pages_per_run=pages_per_run,
-                    send_empty=True
+                    send_empty=send_empty,
+                    delivery=ctx.delivery,
+                    digest=ctx.digest,
                 )
-        await engine.dispose()
+
+
+async def _run_model_group_once(
+    model_param: int,
+    filter_ids: List[int],
+    *,
+    pages_per_run: int = 3,
+    send_empty: bool = True,
+    incremental: bool = INCREMENTAL_CRAWL,
+) -> Dict[str, Any]:
+    """
+    Обход одной модели (подзадача chord). Дайджест здесь не отправляется:
+    совпадения уходят в сводке (summary["digest"]) и в summarize_crawl
+    складываются в один дайджест пользователя за весь цикл. Если прогон
+    упал, накопленное до ошибки отправляется сразу, отдельным дайджестом.
+    """
+    async with get_runtime().task_context() as ctx:
+        filters = await get_filters_by_ids(ctx.session, filter_ids)
+        if not filters:
+            return new_run_summary(model_param, [])
+        summary = await process_model_group(
+            ctx.session, ctx.bot, model_param, filters,
+            pages_per_run=pages_per_run,
+            send_empty=send_empty,
+            incremental=incremental,
+            delivery=ctx.delivery,
+            digest=ctx.digest,
+            streaming=STREAMING_PIPELINE,
+        )
+        if ctx.digest is not None:
+            summary["digest"] = ctx.digest.export()
+        return summary
+
+
+async def _send_crawl_digest(digest: DigestCollector) -> None:
+    """Отправить общий дайджест цикла (из summarize_crawl)"""
+    bot = get_runtime().bot
+    delivery = await DeliveryQueue(bot).start()
+    try:
+        await flush_digest(bot, delivery, digest)
     finally:
-        await bot.session.close()
+        await delivery.close()
+
+
+async def _plan_model_groups() -> Dict[int, List[int]]:
+    """
+    Фильтры, которые пора проверить, разложенные по моделям: {model_param: [filter_id, ...]}.
+    Отданные в обход фильтры откладываются, чтобы следующий запуск их не повторил.
+    """
+    async with get_runtime().SessionLocal() as session:
+        filters = await get_due_filters(session)
+        await postpone_filters(session, [flt.id for flt in filters])
+    return {
+        model_param: [flt.id for flt in group_filters]
+        for model_param, group_filters in group_filters_by_model(filters).items()
+    }
+
+
+@celery_app.task(name="utils.tasks.run_model_group")
+def run_model_group(model_param: int, filter_ids: List[int], pages_per_run: int = 3) -> Dict[str, Any]:
+    """Подзадача цикла: обход одной модели и её фильтров, возвращает сводку"""
+    started = time.monotonic()
+    try:
+        return get_runtime().run(_run_model_group_once(model_param, filter_ids, pages_per_run=pages_per_run))
+    except Exception:
+        # Упавшая подзадача не должна ронять chord — в сводке она видна как ошибка
+        logger.exception(f"Ошибка обработки модели {model_param}")
+        summary = new_run_summary(model_param, filter_ids)
+        summary["errors"] += 1
+        summary["duration"] = round(time.monotonic() - started, 3)
+        return summary
+
+
+@celery_app.task(name="utils.tasks.summarize_crawl", ignore_result=True)
+def summarize_crawl(summaries: List[Dict[str, Any]], started_at: float) -> Dict[str, Any]:
+    """
+    Callback chord: общая сводка цикла по всем моделям и один дайджест
+    на пользователя — из совпадений всех подзадач (summary["digest"]).
+    """
+    digest = DigestCollector()
+    for summary in summaries:
+        if summary:
+            digest.merge(summary.pop("digest", []))
+    if len(digest):
+        get_runtime().run(_send_crawl_digest(digest))
+
+    total = merge_run_summaries(summaries)
+    total["cycle_duration"] = round(time.time() - started_at, 3)
+    logger.info(f"Цикл обхода завершён: {total}")
+    return total
 
 
 @celery_app.task(name="utils.tasks.run_process_filters", ignore_result=True)
 def run_process_filters():
-    """Запуск каждые 15 минут из Celery Beat"""
+    """
+    Запуск каждую минуту из Celery Beat: берутся только модели, чьи фильтры
+    пора проверить (next_check_at, см. utils/polling.py).
+
+    С CRAWL_FANOUT таска только раскладывает фильтры по моделям и запускает
+    chord из подзадач run_model_group: модели обходятся параллельно на всех
+    воркерах, а summarize_crawl собирает общую сводку.
+    """
     logger.info("Celery-таск run_process_filters запущен")
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        loop.run_until_complete(_run_all_filters_once(pages_per_run=3, send_empty=True))
-    finally:
-        try:
-            loop.run_until_complete(asyncio.sleep(0))
-        except Exception:
-            pass
-        loop.close()
-    logger.info("Celery-таск run_process_filters завершён")
+    if not CRAWL_FANOUT:
+        get_runtime().run(_run_all_filters_once(pages_per_run=3, send_empty=True))
+        logger.info("Celery-таск run_process_filters завершён")
+        return
+
+    groups = get_runtime().run(_plan_model_groups())
+    if not groups:
+        logger.info("Фильтров, которые пора проверить, нет")
+        return
+    chord(
+        group(run_model_group.s(model_param, filter_ids, 3) for model_param, filter_ids in groups.items())
+    )(summarize_crawl.s(time.time()))
+    logger.info(f"Celery-таск run_process_filters: запущено подзадач по моделям — {len(groups)}")
+
+
+async def _compact_price_history_once() -> Dict[str, Any]:
+    async with get_runtime().SessionLocal() as session:
+        return await compact_price_history(session)
+
 
+@celery_app.task(name="utils.tasks.compact_price_history", ignore_result=True)
+def compact_price_history_task():
+    """Раз в сутки из Celery Beat: срок хранения и прореживание истории цен (ad_prices, price_observations)"""
+    logger.info("Celery-таск compact_price_history запущен")
+    result = get_runtime().run(_compact_price_history_once())
+    logger.info(f"Celery-таск compact_price_history завершён: {result}")
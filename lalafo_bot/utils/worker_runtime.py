@@ -0,0 +1,160 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, NamedTuple, Optional
+
+from aiogram import Bot
+from dotenv import load_dotenv
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+# До импортов ниже (они читают настройки при импорте) и раньше database.session
+# (где тоже load_dotenv): без этого воркер, запущенный только с .env,
+# получил бы BOT_TOKEN/DATABASE_URL = None
+load_dotenv()
+
+from parser.http_client import close_client, get_client
+from parser.lalafo_parser import shutdown_parse_executor
+from parser.rate_limit import get_rate_limiter
+from parser.response_cache import close_response_cache, get_response_cache
+from utils.delivery import DeliveryQueue
+from utils.digest import DigestCollector, DIGEST_MODE
+from utils.known_ads import get_known_ads_index, warm_known_ads_index
+from utils.check_ads import flush_digest
+
+logger = logging.getLogger(__name__)
+BOT_TOKEN = os.getenv("BOT_TOKEN")
+DATABASE_URL = os.getenv("DATABASE_URL")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+
+
+class TaskContext(NamedTuple):
+    """Что получает прогон таски из WorkerRuntime.task_context"""
+    bot: Bot
+    session: AsyncSession
+    delivery: DeliveryQueue
+    digest: Optional[DigestCollector]
+
+
+class WorkerRuntime:
+    """
+    Ресурсы одного процесса Celery-воркера, живущие между тасками:
+    event loop, пул соединений к БД, HTTP-сессия бота и клиент парсера.
+
+    Раньше каждая таска создавала новый loop, engine и Bot и тут же их
+    закрывала — теперь таска только выполняет корутину в готовом loop.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.engine = create_async_engine(
+            DATABASE_URL,
+            echo=False,
+            pool_pre_ping=True,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+        )
+        self.SessionLocal = sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+        self.bot = Bot(token=BOT_TOKEN)
+        self.pid = os.getpid()
+        self.tasks_run = 0
+
+    def run(self, coro):
+        """Выполнить корутину таски в постоянном loop процесса"""
+        self.tasks_run += 1
+        return self.loop.run_until_complete(coro)
+
+    @asynccontextmanager
+    async def task_context(self) -> AsyncIterator[TaskContext]:
+        """
+        Обвязка прогона таски обхода:
+        - очередь доставки: отправка в Telegram идёт параллельно обходу и не тормозит его;
+        - дайджест (DIGEST_MODE): все совпадения пользователя за прогон — сводными сообщениями;
+        - сессия БД с прогретым индексом известных объявлений.
+        На выходе дайджест и очередь доставки сбрасываются даже при ошибке
+        дальше по прогону — совпадения к этому моменту уже закоммичены —
+        и в лог пишется состояние индекса (размер, hit ratio, память),
+        лимитера и кэша ответов Lalafo (счётчики — с начала процесса)
+        при любом способе запуска: цикл целиком, подзадача модели, один фильтр.
+        """
+        delivery = await DeliveryQueue(self.bot).start()
+        digest = DigestCollector() if DIGEST_MODE else None
+        try:
+            async with self.SessionLocal() as session:
+                await warm_known_ads_index(session)
+                yield TaskContext(self.bot, session, delivery, digest)
+        finally:
+            await flush_digest(self.bot, delivery, digest)
+            await delivery.close()
+            logger.info(f"Индекс известных объявлений: {get_known_ads_index().stats()}")
+            cache = get_response_cache()
+            logger.info(
+                f"Lalafo: лимитер {get_rate_limiter().stats()}, "
+                f"кэш ответов {cache.stats() if cache is not None else 'выключен'}"
+            )
+
+    async def _aclose(self) -> None:
+        await self.bot.session.close()
+        await close_client()
+        await close_response_cache()
+        await self.engine.dispose()
+        shutdown_parse_executor()
+
+    def close(self) -> None:
+        if self.loop.is_closed():
+            return
+        try:
+            self.loop.run_until_complete(self._aclose())
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        finally:
+            self.loop.close()
+        logger.info(f"Ресурсы воркера {self.pid} закрыты (тасок выполнено: {self.tasks_run})")
+
+
+_runtime: Optional[WorkerRuntime] = None
+
+
+def get_runtime() -> WorkerRuntime:
+    """
+    Ресурсы текущего процесса. Создаются в worker_process_init, а если сигнала
+    не было (--pool=solo, вызов таски напрямую) — лениво при первом вызове.
+    После fork дочерний процесс не наследует ресурсы родителя.
+    """
+    global _runtime
+    if _runtime is None or _runtime.pid != os.getpid() or _runtime.loop.is_closed():
+        _runtime = WorkerRuntime()
+        logger.info(f"Ресурсы воркера {_runtime.pid} созданы")
+    return _runtime
+
+
+def shutdown_runtime() -> None:
+    global _runtime
+    if _runtime is not None and _runtime.pid == os.getpid():
+        _runtime.close()
+    _runtime = None
+
+
+async def _open_client() -> None:
+    get_client().session
+
+
+@worker_process_init.connect
+def _on_worker_process_init(**kwargs):
+    runtime = get_runtime()
+    # HTTP-сессия парсера создаётся сразу, в loop процесса
+    runtime.loop.run_until_complete(_open_client())
+
+
+@worker_process_shutdown.connect
+def _on_worker_process_shutdown(**kwargs):
+    shutdown_runtime()
+
+
+@worker_shutdown.connect
+def _on_worker_shutdown(**kwargs):
+    # Для --pool=solo: таски выполнялись в главном процессе
+    shutdown_runtime()